@@ -1,22 +1,29 @@
 import os
 import sys
 import signal
-import struct
-import math
 import time
+import hashlib
 import logging
-from flask import Flask, render_template, jsonify, request
-from modbus_manager import modbus, parse_modbus_error
-from ml_engine import collector, detector
+import numpy as np
+from datetime import datetime
+from functools import partial
+from flask import Flask, Response, g, render_template, jsonify, request
+from modbus_manager import parse_modbus_error
+from plc_poller import snapshot_entry
+from live_stream import stream, flatten_meter, temperature_changed
+from metrics import registry, metric_names
+from read_planner import config_point_groups, config_poll_schedule
+from write_planner import parse_fan_target, apply_fan_targets, target_coils
 from config import (
-    PLC_HOST, PLC_PORT,
+    PLC_HOST, PLC_PORT, INGEST_MODE, INGEST_ADDRESS, INGEST_AUTHKEY,
     METER1_SLAVE_ID, METER2_SLAVE_ID,
     PLC_A_SLAVE_ID, PLC_B_SLAVE_ID, PLC_TEMP_SLAVE_ID,
     METER1_BASE_R, METER2_BASE_R,
     TEMP_COUNT, TEMP_R_REG,
-    METER_CT_RATIO, METER1_PARAMS, METER2_PARAMS, METER_READ_COUNT,
+    METER_CT_RATIO, METER1_PARAMS, METER2_PARAMS, METER_WORD_SWAP,
     BOX_A_CHILLERS, BOX_A_DUAL_FANS, BOX_A_SINGLE_FANS, BOX_A_COIL_COUNT,
     BOX_B_FANS, BOX_B_SINGLES, BOX_B_COIL_COUNT,
+    HISTORY_MAX_POINTS, STREAM_TEMP_DEADBAND, FATEK_Y_OFFSET,
     fatek_r_addr,
 )
 
@@ -26,9 +33,44 @@ logging.basicConfig(level=logging.INFO, format=LOG_FORMAT, datefmt=LOG_DATE_FORM
 logging.getLogger("waitress").setLevel(logging.ERROR)
 logger = logging.getLogger(__name__)
 
+if INGEST_MODE == "client":
+    from ingest import RemoteBackend, remote_exception_type
+
+    backend = RemoteBackend(INGEST_ADDRESS, INGEST_AUTHKEY)
+    modbus = backend.modbus
+    poller = backend.poller
+    collector = backend.collector
+    detector = backend.detector
+    trainer = backend.trainer
+    TrainingBusyError = remote_exception_type("TrainingBusyError")
+    stream.poller = poller
+else:
+    from modbus_manager import modbus
+    from ml_engine import collector, detector
+    from plc_poller import poller
+    from training_jobs import trainer, TrainingBusyError
+
 app = Flask(__name__)
 app.secret_key = os.environ.get("SESSION_SECRET", "dev-secret-key")
 
+HTTP_SECONDS = registry.histogram(
+    "http_request_seconds", "Flask 請求處理時間", ("route", "method", "status"),
+)
+
+
+@app.before_request
+def start_timer():
+    g.request_started = time.perf_counter()
+
+
+@app.after_request
+def record_latency(response):
+    started = g.pop("request_started", None)
+    if started is not None:
+        route = request.url_rule.rule if request.url_rule is not None else "unmatched"
+        HTTP_SECONDS.observe(time.perf_counter() - started, route, request.method, response.status_code)
+    return response
+
 
 @app.errorhandler(500)
 def internal_error(error):
@@ -36,6 +78,12 @@ def internal_error(error):
     return jsonify({"error": "內部伺服器錯誤", "detail": str(error)}), 500
 
 
+@app.errorhandler(ConnectionError)
+def backend_unavailable(error):
+    logger.warning(f"後端連線失敗: {error}")
+    return jsonify({"error": str(error)}), 503
+
+
 @app.errorhandler(Exception)
 def unhandled_exception(error):
     logger.error(f"Unhandled Exception: {error}", exc_info=True)
@@ -50,39 +98,213 @@ RTD_ERROR_CODES = {
 }
 
 
-def regs_to_float(regs, offset):
-    try:
-        raw = struct.pack('>HH', regs[offset], regs[offset + 1])
-        value = struct.unpack('>f', raw)[0]
-        if math.isnan(value) or math.isinf(value):
-            return None
-        return round(value, 2)
-    except (IndexError, struct.error):
-        return None
+def format_time(ts):
+    return datetime.fromtimestamp(ts).strftime("%Y-%m-%d %H:%M:%S")
+
+
+RTD_ERROR_ARRAY = np.array(sorted(RTD_ERROR_CODES), dtype=np.uint16)
+
+def wants_compact():
+    return request.args.get("format") == "compact"
+
+
+def snapshot_etag(snap, name, version):
+    suffix = "-c" if wants_compact() else ""
+    return f"{snap['epoch']}-{name}-{version}{suffix}"
+
+
+def conditional_response(etag, build, weak=True):
+    if request.if_none_match.contains_weak(etag):
+        response = Response(status=304)
+    else:
+        response = build()
+    response.set_etag(etag, weak=weak)
+    response.headers["Cache-Control"] = "no-cache"
+    return response
+
+
+def pack_coils(coils, count):
+    bits = np.fromiter((bool(coils.get(str(i))) for i in range(count)), dtype=np.uint8, count=count)
+    mask = int.from_bytes(np.packbits(bits, bitorder="little").tobytes(), "little")
+    return format(mask, f"0{(count + 3) // 4}x")
+
+
+def regs_to_float_array(words, word_swap=False):
+    pairs = np.ascontiguousarray(np.asarray(words, dtype=np.uint16).reshape(-1, 2))
+    if word_swap:
+        pairs = np.ascontiguousarray(pairs[:, ::-1])
+    return pairs.astype('>u2').view('>f4').ravel()
+
+
+def scale_float_array(values, divs=None, decimals=2):
+    values = values.astype(np.float64)
+    valid = np.isfinite(values)
+    scaled = np.round(np.where(valid, values, 0.0), decimals)
+    if divs is not None:
+        divs = np.asarray(divs, dtype=np.float64)
+        scaled = np.where(divs != 1, np.round(scaled / divs, decimals), scaled)
+    return [float(v) if ok else None for v, ok in zip(scaled, valid)]
+
+
+def convert_pt100_array(raws, scale=10.0):
+    raw = np.asarray(raws, dtype=np.uint16)
+    temps = np.round(raw.view(np.int16) / scale, 1)
+    errors = np.isin(raw, RTD_ERROR_ARRAY)
+    return raw, np.where(errors, np.nan, temps), errors
+
+
+def convert_pt100_block(raws):
+    raw, temps, errors = convert_pt100_array(raws)
+    channels = []
+    for value, temp, is_error in zip(raw.tolist(), temps.tolist(), errors.tolist()):
+        if is_error:
+            channels.append({"raw": value, "temperature": None, "error": RTD_ERROR_CODES[value]})
+        else:
+            channels.append({"raw": value, "temperature": temp, "error": None})
+    return channels
+
+
+def meter_layout(slave_id):
+    if slave_id == METER1_SLAVE_ID:
+        return METER1_BASE_R, METER1_PARAMS, "R0~R3 被 PLC 覆寫，L1-N/L2-N 電壓不可用"
+    if slave_id == METER2_SLAVE_ID:
+        return METER2_BASE_R, METER2_PARAMS, None
+    return None
+
+
+def coil_bank(box):
+    if box == "a":
+        return PLC_A_SLAVE_ID, BOX_A_COIL_COUNT
+    if box == "b":
+        return PLC_B_SLAVE_ID, BOX_B_COIL_COUNT
+    return None
+
+
+def poll_temperatures(values):
+    channels = {}
+    decoded = convert_pt100_block([values[f"CH{i}"][0] for i in range(TEMP_COUNT)])
+    for i, ch_data in enumerate(decoded):
+        ch_name = f"CH{i}"
+        ch_data["r_addr"] = TEMP_R_REG + i
+        channels[ch_name] = ch_data
+        ch_data["anomaly"] = False
+
+    analyses = detector.analyze_batch({
+        ch_name: ch_data["temperature"]
+        for ch_name, ch_data in channels.items()
+        if ch_data["temperature"] is not None and ch_data["temperature"] != 0
+    })
+    for ch_name, analysis in analyses.items():
+        ch_data = channels[ch_name]
+        ch_data["anomaly"] = analysis.get("is_anomaly", False)
+        if analysis.get("is_anomaly"):
+            ch_data["anomaly_info"] = {
+                "statistical": analysis.get("statistical", {}),
+                "autoencoder": analysis.get("autoencoder"),
+            }
+
+    collector.record_temperature(channels)
+    return channels
+
+
+def decode_coils(box, values):
+    coil_count = coil_bank(box)[1]
 
+    coils = {}
+    for i in range(coil_count):
+        coils[str(i)] = values[str(i)][0]
+    return coils
 
-def convert_pt100_raw(raw_uint16):
-    if raw_uint16 in RTD_ERROR_CODES:
-        return {"raw": raw_uint16, "temperature": None, "error": RTD_ERROR_CODES[raw_uint16]}
-    signed_val = raw_uint16 - 0x10000 if raw_uint16 >= 0x8000 else raw_uint16
-    temperature = signed_val / 10.0
-    return {"raw": raw_uint16, "temperature": round(temperature, 1), "error": None}
 
+def poll_coils(box, values):
+    coils = decode_coils(box, values)
+    collector.record_hvac(box, coils)
+    return coils
 
-def read_all_temperatures():
+
+def mark_pending(box, coils):
+    count = coil_bank(box)[1]
+    updates = {
+        str(address - FATEK_Y_OFFSET): bool(value)
+        for address, value in coils.items()
+        if 0 <= address - FATEK_Y_OFFSET < count
+    }
     try:
-        address = fatek_r_addr(TEMP_R_REG)
-        result = modbus.read_holding_registers(address, TEMP_COUNT, PLC_TEMP_SLAVE_ID)
-        if hasattr(result, 'isError') and result.isError():
-            return None
-        channels = {}
-        for i, raw in enumerate(result.registers):
-            ch_data = convert_pt100_raw(raw)
-            ch_data["r_addr"] = TEMP_R_REG + i
-            channels[f"CH{i}"] = ch_data
-        return channels
-    except Exception:
-        return None
+        poller.apply_optimistic(f"box_{box}_coils", updates)
+    except ConnectionError as e:
+        logger.warning(f"樂觀更新失敗 ({box.upper()}箱): {e}")
+
+
+def poll_meter(slave_id, values):
+    base_r, meter_params, note = meter_layout(slave_id)
+
+    floats = regs_to_float_array([values[p["offset"]] for p in meter_params], METER_WORD_SWAP)
+    scaled = scale_float_array(floats, [p.get("div", 1) for p in meter_params])
+
+    params = []
+    for p, value in zip(meter_params, scaled):
+        params.append({
+            "name": p["name"],
+            "value": value,
+            "unit": p["unit"],
+            "group": p["group"],
+            "r_addr": base_r + p["offset"],
+        })
+
+    collector.record_meter(slave_id, scaled)
+
+    resp = {
+        "status": "success",
+        "slave_id": slave_id,
+        "base_r": base_r,
+        "ct_ratio": METER_CT_RATIO,
+        "params": params,
+    }
+    if note:
+        resp["note"] = note
+    return resp
+
+
+def shutdown_backend():
+    poller.stop()
+    trainer.close()
+    modbus.close()
+    collector.close()
+
+
+if INGEST_MODE != "client":
+    _point_groups = config_point_groups()
+    _schedule = config_poll_schedule()
+    poller.register("temperatures", _point_groups["temperatures"], poll_temperatures, **_schedule["temperatures"])
+    for _box in ("b", "a"):
+        _name = f"box_{_box}_coils"
+        poller.register(
+            _name, _point_groups[_name], partial(poll_coils, _box), **_schedule[_name],
+            confirm=partial(decode_coils, _box),
+        )
+    for _meter_id in (METER1_SLAVE_ID, METER2_SLAVE_ID):
+        _name = f"meter_{_meter_id}"
+        poller.register(_name, _point_groups[_name], partial(poll_meter, _meter_id), **_schedule[_name])
+    poller.start()
+
+for _meter_id in (METER1_SLAVE_ID, METER2_SLAVE_ID):
+    stream.register(f"meter_{_meter_id}", flatten=flatten_meter)
+stream.register("temperatures", changed=temperature_changed(STREAM_TEMP_DEADBAND))
+stream.register("box_b_coils")
+stream.register("box_a_coils")
+
+
+@app.route("/metrics")
+def prometheus_metrics():
+    if INGEST_MODE == "client":
+        try:
+            remote = backend.metrics.render()
+        except ConnectionError:
+            remote = ""
+        body = remote + registry.render(exclude=metric_names(remote))
+    else:
+        body = registry.render()
+    return Response(body, mimetype="text/plain; version=0.0.4")
 
 
 @app.route("/health")
@@ -108,110 +330,74 @@ def api_status():
         "host": PLC_HOST,
         "port": PLC_PORT,
         "stats": stats,
+        "poller": poller.get_stats(),
+        "stream": stream.get_stats(),
+        "ingest": INGEST_MODE,
     })
 
 
+CONFIG_BODY = app.json.dumps({
+    "plc_host": PLC_HOST,
+    "plc_port": PLC_PORT,
+    "ct_ratio": METER_CT_RATIO,
+    "meter1_slave": METER1_SLAVE_ID,
+    "meter2_slave": METER2_SLAVE_ID,
+    "plc_a_slave": PLC_A_SLAVE_ID,
+    "plc_b_slave": PLC_B_SLAVE_ID,
+    "temp_r_reg": TEMP_R_REG,
+    "temp_count": TEMP_COUNT,
+    "box_a": {
+        "chillers": BOX_A_CHILLERS,
+        "dual_fans": BOX_A_DUAL_FANS,
+        "single_fans": BOX_A_SINGLE_FANS,
+    },
+    "box_b": {"fans": BOX_B_FANS, "singles": BOX_B_SINGLES},
+}) + "\n"
+CONFIG_ETAG = hashlib.sha1(CONFIG_BODY.encode("utf-8")).hexdigest()[:16]
+
+
 @app.route("/api/config")
 def api_config():
-    return jsonify({
-        "plc_host": PLC_HOST,
-        "plc_port": PLC_PORT,
-        "ct_ratio": METER_CT_RATIO,
-        "meter1_slave": METER1_SLAVE_ID,
-        "meter2_slave": METER2_SLAVE_ID,
-        "plc_a_slave": PLC_A_SLAVE_ID,
-        "plc_b_slave": PLC_B_SLAVE_ID,
-        "temp_r_reg": TEMP_R_REG,
-        "temp_count": TEMP_COUNT,
-        "box_a": {
-            "chillers": BOX_A_CHILLERS,
-            "dual_fans": BOX_A_DUAL_FANS,
-            "single_fans": BOX_A_SINGLE_FANS,
-        },
-        "box_b": {"fans": BOX_B_FANS, "singles": BOX_B_SINGLES},
-    })
+    return conditional_response(CONFIG_ETAG, lambda: Response(CONFIG_BODY, mimetype="application/json"), weak=False)
 
 
 @app.route("/api/meter/<int:slave_id>")
 def read_meter(slave_id):
-    if slave_id == METER1_SLAVE_ID:
-        base_r = METER1_BASE_R
-        meter_params = METER1_PARAMS
-        note = "R0~R3 被 PLC 覆寫，L1-N/L2-N 電壓不可用"
-    elif slave_id == METER2_SLAVE_ID:
-        base_r = METER2_BASE_R
-        meter_params = METER2_PARAMS
-        note = None
-    else:
+    if meter_layout(slave_id) is None:
         return jsonify({"error": "無效的電表 Slave ID"}), 400
 
-    try:
-        modbus_addr = fatek_r_addr(base_r)
-        result = modbus.read_holding_registers(modbus_addr, METER_READ_COUNT, PLC_A_SLAVE_ID)
-        if hasattr(result, 'isError') and result.isError():
-            err_msg = parse_modbus_error(result)
-            logger.warning(f"電表 {slave_id} (R{base_r}) 讀取失敗: {err_msg}")
-            return jsonify({"error": err_msg}), 500
-
-        regs = result.registers
-
-        params = []
-        for p in meter_params:
-            offset = p["offset"]
-            value = regs_to_float(regs, offset)
-            if value is not None and "div" in p:
-                value = round(value / p["div"], 2)
-            params.append({
-                "name": p["name"],
-                "value": value,
-                "unit": p["unit"],
-                "group": p["group"],
-                "r_addr": base_r + offset,
-            })
-
-        resp = {
-            "status": "success",
-            "slave_id": slave_id,
-            "base_r": base_r,
-            "ct_ratio": METER_CT_RATIO,
-            "params": params,
-        }
-        if note:
-            resp["note"] = note
-        return jsonify(resp)
-    except ConnectionError as e:
-        return jsonify({"error": str(e)}), 503
-    except Exception as e:
-        return jsonify({"error": f"讀取錯誤: {str(e)}"}), 500
+    name = f"meter_{slave_id}"
+    snap = poller.get_snapshot()
+    resp, error, updated, version = snapshot_entry(snap, name)
+    if error:
+        return jsonify({"error": error}), 503
+    return conditional_response(
+        snapshot_etag(snap, name, version),
+        lambda: jsonify({**resp, "timestamp": updated}),
+    )
 
 
 @app.route("/api/hvac/<box>/status")
 def hvac_status(box):
-    if box == "a":
-        slave_id = PLC_A_SLAVE_ID
-        coil_count = BOX_A_COIL_COUNT
-    elif box == "b":
-        slave_id = PLC_B_SLAVE_ID
-        coil_count = BOX_B_COIL_COUNT
-    else:
+    if coil_bank(box) is None:
         return jsonify({"error": "無效的箱號"}), 400
 
-    try:
-        result = modbus.read_coils(0, coil_count, slave_id)
-        if hasattr(result, 'isError') and result.isError():
-            return jsonify({"error": parse_modbus_error(result)}), 500
-
-        coils = {}
-        for i in range(coil_count):
-            coils[str(i)] = result.bits[i]
-
-        collector.record_hvac(box, coils)
-
-        return jsonify({"status": "success", "box": box, "coils": coils})
-    except ConnectionError as e:
-        return jsonify({"error": str(e)}), 503
-    except Exception as e:
-        return jsonify({"error": f"讀取錯誤: {str(e)}"}), 500
+    name = f"box_{box}_coils"
+    snap = poller.get_snapshot()
+    coils, error, updated, version = snapshot_entry(snap, name)
+    if error:
+        return jsonify({"error": error}), 503
+    pending = sorted(snap.get("pending", {}).get(name, {}), key=int)
+
+    def build():
+        if wants_compact():
+            count = coil_bank(box)[1]
+            return jsonify({
+                "status": "success", "box": box, "coil_count": count,
+                "coils": pack_coils(coils, count), "pending": pending, "timestamp": updated,
+            })
+        return jsonify({"status": "success", "box": box, "coils": coils, "pending": pending, "timestamp": updated})
+    return conditional_response(snapshot_etag(snap, name, version), build)
 
 
 @app.route("/api/hvac/<box>/coil", methods=["POST"])
@@ -237,6 +423,7 @@ def hvac_write_coil(box):
         if hasattr(result, 'isError') and result.isError():
             return jsonify({"error": parse_modbus_error(result)}), 500
 
+        mark_pending(box, {int(address): bool(value)})
         return jsonify({"success": True, "address": address, "value": bool(value)})
     except ConnectionError as e:
         return jsonify({"error": str(e)}), 503
@@ -262,11 +449,16 @@ def hvac_fan_speed(box):
     speed = data.get("speed")
 
     if y_h is None and y_l is not None and speed in ("off", "on"):
+        try:
+            target = parse_fan_target({"box": box, "y_l": y_l, "speed": speed})
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 400
         try:
             val = speed == "on"
-            r = modbus.write_coil(int(y_l), val, slave_id)
+            r = modbus.write_coil(target["y_l"], val, slave_id)
             if hasattr(r, 'isError') and r.isError():
                 return jsonify({"error": parse_modbus_error(r)}), 500
+            mark_pending(box, {target["y_l"]: val})
             return jsonify({"success": True, "speed": speed})
         except ConnectionError as e:
             return jsonify({"error": str(e)}), 503
@@ -276,32 +468,44 @@ def hvac_fan_speed(box):
     if y_l is None or y_h is None or speed not in ("off", "low", "high"):
         return jsonify({"error": "需要 y_l, y_h 和 speed (off/low/high)"}), 400
 
-    if speed == "off":
-        l_val, h_val = False, False
-    elif speed == "low":
-        l_val, h_val = True, False
-    else:
-        l_val, h_val = True, True
-
     try:
-        r1 = modbus.write_coil(int(y_h), False, slave_id)
-        if hasattr(r1, 'isError') and r1.isError():
-            return jsonify({"error": parse_modbus_error(r1)}), 500
+        target = parse_fan_target({"box": box, "y_l": y_l, "y_h": y_h, "speed": speed})
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
 
-        r2 = modbus.write_coil(int(y_l), l_val, slave_id)
-        if hasattr(r2, 'isError') and r2.isError():
-            return jsonify({"error": parse_modbus_error(r2)}), 500
+    (result,), _ = apply_fan_targets(modbus, [target])
+    if not result["success"]:
+        return jsonify({"error": result["error"]}), 503 if result["retryable"] else 500
+    mark_pending(box, target_coils(target)[1])
+    return jsonify({"success": True, "speed": speed})
 
-        if h_val:
-            r3 = modbus.write_coil(int(y_h), True, slave_id)
-            if hasattr(r3, 'isError') and r3.isError():
-                return jsonify({"error": parse_modbus_error(r3)}), 500
 
-        return jsonify({"success": True, "speed": speed})
-    except ConnectionError as e:
-        return jsonify({"error": str(e)}), 503
-    except Exception as e:
-        return jsonify({"error": f"寫入錯誤: {str(e)}"}), 500
+@app.route("/api/hvac/fans", methods=["POST"])
+def hvac_fans_bulk():
+    data = request.get_json(silent=True)
+    items = data.get("targets") if isinstance(data, dict) else None
+    if not isinstance(items, list) or not items:
+        return jsonify({"error": "需要 targets 陣列"}), 400
+
+    try:
+        targets = [parse_fan_target(item) for item in items]
+        results, transactions = apply_fan_targets(modbus, targets)
+    except (ValueError, TypeError, AttributeError) as e:
+        return jsonify({"error": f"目標格式錯誤: {e}"}), 400
+
+    confirmed = {}
+    for target, result in zip(targets, results):
+        if result["success"]:
+            confirmed.setdefault(target["box"], {}).update(target_coils(target)[1])
+    for box, coils in confirmed.items():
+        mark_pending(box, coils)
+
+    success = all(r["success"] for r in results)
+    return jsonify({
+        "success": success,
+        "results": results,
+        "transactions": transactions,
+    }), 200 if success else 207
 
 
 @app.route("/api/temperatures")
@@ -314,30 +518,28 @@ def get_temperatures():
 
     address = fatek_r_addr(r_reg)
 
+    if r_reg == TEMP_R_REG and count == TEMP_COUNT:
+        snap = poller.get_snapshot()
+        channels, error, updated, version = snapshot_entry(snap, "temperatures")
+        if error:
+            return jsonify({"error": error}), 503
+        return conditional_response(snapshot_etag(snap, "temperatures", version), lambda: jsonify({
+            "status": "success",
+            "r_reg": r_reg,
+            "address": address,
+            "data": channels,
+            "timestamp": updated,
+        }))
+
     try:
         result = modbus.read_holding_registers(address, count, PLC_TEMP_SLAVE_ID)
         if hasattr(result, 'isError') and result.isError():
             return jsonify({"error": parse_modbus_error(result)}), 500
 
         channels = {}
-        for i, raw in enumerate(result.registers):
-            ch_name = f"CH{i}"
-            ch_data = convert_pt100_raw(raw)
+        for i, ch_data in enumerate(convert_pt100_block(result.registers)):
             ch_data["r_addr"] = r_reg + i
-            channels[ch_name] = ch_data
-
-            if ch_data["temperature"] is not None and ch_data["temperature"] != 0:
-                analysis = detector.analyze(ch_name, ch_data["temperature"])
-                ch_data["anomaly"] = analysis.get("is_anomaly", False)
-                if analysis.get("is_anomaly"):
-                    ch_data["anomaly_info"] = {
-                        "statistical": analysis.get("statistical", {}),
-                        "autoencoder": analysis.get("autoencoder"),
-                    }
-            else:
-                ch_data["anomaly"] = False
-
-        collector.record_temperature(channels)
+            channels[f"CH{i}"] = ch_data
 
         return jsonify({
             "status": "success",
@@ -353,51 +555,42 @@ def get_temperatures():
 
 @app.route("/api/plc/overview")
 def plc_overview():
-    result = {"status": "success"}
-    try:
-        temps = read_all_temperatures()
-        if temps:
-            result["temperatures"] = temps
-        else:
-            result["temperatures"] = None
-            result["temp_error"] = "溫度讀取失敗"
-    except Exception as e:
-        result["temperatures"] = None
-        result["temp_error"] = str(e)
-
-    try:
-        b_coils_result = modbus.read_coils(0, BOX_B_COIL_COUNT, PLC_B_SLAVE_ID)
-        if hasattr(b_coils_result, 'isError') and b_coils_result.isError():
-            result["box_b_coils"] = None
-            result["box_b_error"] = "B箱線圈讀取錯誤"
-            logger.warning("PLC 總覽: B箱線圈讀取失敗")
-        else:
-            coils = {}
-            for i in range(BOX_B_COIL_COUNT):
-                coils[str(i)] = b_coils_result.bits[i]
-            result["box_b_coils"] = coils
-    except Exception as e:
-        result["box_b_coils"] = None
-        result["box_b_error"] = str(e)
-        logger.warning(f"PLC 總覽: B箱線圈例外 - {e}")
-
-    try:
-        a_coils_result = modbus.read_coils(0, BOX_A_COIL_COUNT, PLC_A_SLAVE_ID)
-        if hasattr(a_coils_result, 'isError') and a_coils_result.isError():
-            result["box_a_coils"] = None
-            result["box_a_error"] = "A箱線圈讀取錯誤"
-            logger.warning("PLC 總覽: A箱線圈讀取失敗")
-        else:
-            coils = {}
-            for i in range(BOX_A_COIL_COUNT):
-                coils[str(i)] = a_coils_result.bits[i]
-            result["box_a_coils"] = coils
-    except Exception as e:
-        result["box_a_coils"] = None
-        result["box_a_error"] = str(e)
-        logger.warning(f"PLC 總覽: A箱線圈例外 - {e}")
-
-    return jsonify(result)
+    snap = poller.get_snapshot()
+    values = snap["values"]
+    errors = snap["errors"]
+    compact = wants_compact()
+
+    def build():
+        result = {"status": "success", "version": snap["version"], "timestamp": snap["timestamp"]}
+
+        result["temperatures"] = values.get("temperatures")
+        if result["temperatures"] is None:
+            result["temp_error"] = errors.get("temperatures") or "溫度讀取失敗"
+
+        for box, label in (("b", "B箱"), ("a", "A箱")):
+            coils = values.get(f"box_{box}_coils")
+            if coils is not None and compact:
+                count = coil_bank(box)[1]
+                result[f"box_{box}_coil_count"] = count
+                coils = pack_coils(coils, count)
+            result[f"box_{box}_coils"] = coils
+            if coils is None:
+                result[f"box_{box}_error"] = errors.get(f"box_{box}_coils") or f"{label}線圈讀取錯誤"
+
+        return jsonify(result)
+    return conditional_response(snapshot_etag(snap, "overview", snap["version"]), build)
+
+
+@app.route("/api/stream")
+def live_stream():
+    release = stream.acquire()
+    if release is None:
+        return jsonify({"error": "即時串流連線數已達上限"}), 503
+    response = Response(stream.events(), mimetype="text/event-stream")
+    response.headers["Cache-Control"] = "no-cache"
+    response.headers["X-Accel-Buffering"] = "no"
+    response.call_on_close(release)
+    return response
 
 
 @app.route("/api/ml/status")
@@ -405,47 +598,229 @@ def ml_status():
     stats = modbus.get_stats()
     return jsonify({
         "modbus": stats,
-        "ml": {
-            "temperature_records": len(collector.temperature_history),
-            "hvac_records": len(collector.hvac_history),
-            "torch_available": detector._torch_available,
-            "channels_tracked": list(detector.channel_windows.keys()),
-        },
+        "ml": {**collector.get_stats(), **detector.get_status()},
     })
 
 
+def history_range_args():
+    if not any(key in request.args for key in ("from", "to", "max_points")):
+        return None
+    t_to = request.args.get("to", time.time(), type=float)
+    t_from = request.args.get("from", t_to - 86400, type=float)
+    max_points = request.args.get("max_points", 500, type=int)
+    return t_from, t_to, min(max(max_points, 3), HISTORY_MAX_POINTS), request.args.get("mode", "auto")
+
+
+def format_range_series(data, value_key, decimals):
+    series = []
+    stats = "min" in data
+    columns = [data["ts"].tolist(), data["avg"].tolist()]
+    if stats:
+        columns += [data["min"].tolist(), data["max"].tolist(), data["count"].tolist()]
+    for row in zip(*columns):
+        item = {"timestamp": row[0], "time_str": format_time(row[0]), value_key: round(row[1], decimals)}
+        if stats:
+            item["min"] = round(row[2], decimals)
+            item["max"] = round(row[3], decimals)
+            item["samples"] = row[4]
+        series.append(item)
+    return series
+
+
 @app.route("/api/ml/history/temperature")
 def ml_temp_history():
     channel = request.args.get("channel", "CH0")
+    range_args = history_range_args()
+    if range_args is not None:
+        t_from, t_to, max_points, mode = range_args
+        if t_from >= t_to:
+            return jsonify({"error": "from 必須早於 to"}), 400
+        data = collector.query_temperature(channel, t_from, t_to, max_points, mode)
+        series = format_range_series(data, "value", 1)
+        return jsonify({
+            "channel": channel,
+            "from": t_from,
+            "to": t_to,
+            "resolution": data["resolution"],
+            "count": len(series),
+            "data": series,
+        })
+
     limit = request.args.get("limit", 200, type=int)
-    series = collector.get_temperature_series(channel, limit)
+    timestamps, values = collector.get_temperature_series(channel, limit)
+    series = [
+        {"timestamp": ts, "time_str": format_time(ts), "value": round(value, 1)}
+        for ts, value in zip(timestamps.tolist(), values.tolist())
+    ]
     return jsonify({"channel": channel, "count": len(series), "data": series})
 
 
 @app.route("/api/ml/history/hvac")
 def ml_hvac_history():
     box = request.args.get("box", "a")
+    range_args = history_range_args()
+    if range_args is not None:
+        if coil_bank(box) is None:
+            return jsonify({"error": "無效的箱號"}), 400
+        t_from, t_to, max_points, mode = range_args
+        if t_from >= t_to:
+            return jsonify({"error": "from 必須早於 to"}), 400
+        data = collector.query_hvac(box, t_from, t_to, max_points, mode)
+        series = format_range_series(data, "on_count", 2)
+        total = coil_bank(box)[1]
+        for item in series:
+            item["total"] = total
+        return jsonify({
+            "box": box,
+            "from": t_from,
+            "to": t_to,
+            "resolution": data["resolution"],
+            "count": len(series),
+            "data": series,
+        })
+
     limit = request.args.get("limit", 200, type=int)
-    series = collector.get_hvac_series(box, limit)
+    records = collector.get_hvac_series(box, limit)
+    series = [
+        {"timestamp": ts, "time_str": format_time(ts), "on_count": on_count, "total": total}
+        for ts, on_count, total in zip(
+            records["ts"].tolist(), records["on_count"].tolist(), records["total"].tolist()
+        )
+    ]
     return jsonify({"box": box, "count": len(series), "data": series})
 
 
+def parse_day(value, default):
+    if value is None:
+        return default
+    return datetime.strptime(value, "%Y-%m-%d").date()
+
+
+@app.route("/api/ml/history/meter")
+def ml_meter_history():
+    slave_id = request.args.get("slave_id", METER1_SLAVE_ID, type=int)
+    layout = meter_layout(slave_id)
+    if layout is None:
+        return jsonify({"error": "無效的電表 Slave ID"}), 400
+    param = request.args.get("param", "總功率")
+    names = [p["name"] for p in layout[1]]
+    if param not in names:
+        return jsonify({"error": f"無效的參數，可用: {', '.join(names)}"}), 400
+
+    t_from, t_to, max_points, mode = history_range_args() or (time.time() - 86400, time.time(), 500, "auto")
+    if t_from >= t_to:
+        return jsonify({"error": "from 必須早於 to"}), 400
+    data = collector.query_meter(slave_id, names.index(param), t_from, t_to, max_points, mode)
+    series = format_range_series(data, "value", 3)
+    return jsonify({
+        "slave_id": slave_id,
+        "param": param,
+        "unit": layout[1][names.index(param)]["unit"],
+        "from": t_from,
+        "to": t_to,
+        "resolution": data["resolution"],
+        "count": len(series),
+        "data": series,
+    })
+
+
+@app.route("/api/energy/daily")
+def energy_daily():
+    try:
+        day = parse_day(request.args.get("date"), datetime.now().date())
+    except ValueError:
+        return jsonify({"error": "日期格式需為 YYYY-MM-DD"}), 400
+    return jsonify({"status": "success", **collector.get_energy_daily(day)})
+
+
+@app.route("/api/energy/monthly")
+def energy_monthly():
+    month = request.args.get("month")
+    try:
+        first = datetime.strptime(month, "%Y-%m") if month else datetime.now()
+    except ValueError:
+        return jsonify({"error": "月份格式需為 YYYY-MM"}), 400
+    return jsonify({"status": "success", **collector.get_energy_monthly(first.year, first.month)})
+
+
+@app.route("/api/equipment/runtime")
+def equipment_runtime():
+    today = datetime.now().date()
+    try:
+        first_day = parse_day(request.args.get("from"), today.replace(day=1))
+        last_day = parse_day(request.args.get("to"), today)
+    except ValueError:
+        return jsonify({"error": "日期格式需為 YYYY-MM-DD"}), 400
+    if first_day > last_day:
+        return jsonify({"error": "from 不可晚於 to"}), 400
+
+    devices = collector.get_equipment_runtime(first_day, last_day)
+    device_id = request.args.get("device")
+    if device_id is not None:
+        devices = [d for d in devices if d["id"] == device_id]
+        if not devices:
+            return jsonify({"error": "無效的設備"}), 404
+    return jsonify({
+        "status": "success",
+        "from": first_day.isoformat(),
+        "to": last_day.isoformat(),
+        "devices": devices,
+    })
+
+
+@app.route("/api/equipment/transitions")
+def equipment_transitions():
+    box = request.args.get("box", "a")
+    if coil_bank(box) is None:
+        return jsonify({"error": "無效的箱號"}), 400
+    t_from = request.args.get("from", type=float)
+    t_to = request.args.get("to", type=float)
+    limit = min(max(request.args.get("limit", 200, type=int), 1), HISTORY_MAX_POINTS)
+
+    items = collector.get_equipment_transitions(box, t_from, t_to, limit)
+    for item in items:
+        item["time_str"] = format_time(item["ts"])
+    return jsonify({"box": box, "count": len(items), "data": items})
+
+
 @app.route("/api/ml/train", methods=["POST"])
 def ml_train():
     channel = request.args.get("channel", "CH0")
     epochs = request.args.get("epochs", 50, type=int)
-    result = detector.train_model(collector, channel, epochs)
-    return jsonify(result)
+    try:
+        job = trainer.submit(channel, epochs)
+    except TrainingBusyError as e:
+        return jsonify({"success": False, "reason": str(e)}), 409
+    except ValueError as e:
+        return jsonify({"success": False, "reason": str(e)})
+    return jsonify({"success": True, "job": job.to_dict()}), 202
+
+
+@app.route("/api/ml/train/jobs")
+def ml_train_jobs():
+    jobs = [job.to_dict(include_losses=False) for job in trainer.list()]
+    return jsonify({"jobs": jobs[::-1]})
+
+
+@app.route("/api/ml/train/<job_id>")
+def ml_train_job(job_id):
+    job = trainer.get(job_id)
+    if job is None:
+        return jsonify({"error": "找不到訓練工作"}), 404
+    return jsonify({"success": True, "job": job.to_dict()})
+
+
+@app.route("/api/ml/train/<job_id>/cancel", methods=["POST"])
+def ml_train_cancel(job_id):
+    job = trainer.cancel(job_id)
+    if job is None:
+        return jsonify({"error": "找不到訓練工作"}), 404
+    return jsonify({"success": True, "job": job.to_dict(include_losses=False)})
 
 
 @app.route("/api/ml/analyze")
 def ml_analyze():
-    results = {}
-    for channel, window in detector.channel_windows.items():
-        if len(window) > 0:
-            latest_value = window[-1]
-            results[channel] = detector.analyze(channel, latest_value)
-    return jsonify({"channels": results})
+    return jsonify({"channels": detector.analyze_latest()})
 
 
 if __name__ == "__main__":
@@ -455,7 +830,7 @@ if __name__ == "__main__":
         sig_name = signal.Signals(signum).name
         logger.warning(f"收到信號 {sig_name} ({signum})")
         if signum in (signal.SIGTERM, signal.SIGINT):
-            modbus.close()
+            shutdown_backend()
             sys.exit(0)
 
     signal.signal(signal.SIGTERM, signal_handler)
@@ -0,0 +1,154 @@
+import os
+import sys
+import json
+import numpy as np
+
+WINDOW = 10
+
+LAYERS = [
+    ("encoder.0", True),
+    ("encoder.2", True),
+    ("encoder.4", False),
+    ("decoder.0", True),
+    ("decoder.2", True),
+    ("decoder.4", False),
+]
+
+
+def build_autoencoder(input_dim=WINDOW):
+    import torch.nn as nn
+
+    class AutoEncoder(nn.Module):
+        def __init__(self, input_dim=10):
+            super().__init__()
+            self.encoder = nn.Sequential(
+                nn.Linear(input_dim, 8),
+                nn.ReLU(),
+                nn.Linear(8, 4),
+                nn.ReLU(),
+                nn.Linear(4, 2),
+            )
+            self.decoder = nn.Sequential(
+                nn.Linear(2, 4),
+                nn.ReLU(),
+                nn.Linear(4, 8),
+                nn.ReLU(),
+                nn.Linear(8, input_dim),
+            )
+
+        def forward(self, x):
+            encoded = self.encoder(x)
+            decoded = self.decoder(encoded)
+            return decoded
+
+    return AutoEncoder(input_dim=input_dim)
+
+
+def export_weights(state_dict, path):
+    arrays = {}
+    for name, _ in LAYERS:
+        arrays[f"{name}.weight"] = state_dict[f"{name}.weight"].detach().cpu().numpy().astype(np.float32)
+        arrays[f"{name}.bias"] = state_dict[f"{name}.bias"].detach().cpu().numpy().astype(np.float32)
+    with open(path, "wb") as f:
+        np.savez(f, **arrays)
+
+
+def weights_path_for(model_path):
+    return os.path.splitext(model_path)[0] + ".npz"
+
+
+class NumpyAutoEncoder:
+    def __init__(self, layers):
+        self.layers = layers
+
+    @classmethod
+    def load(cls, path):
+        with np.load(path) as data:
+            layers = [
+                (data[f"{name}.weight"].T.copy(), data[f"{name}.bias"].copy(), relu)
+                for name, relu in LAYERS
+            ]
+        return cls(layers)
+
+    def __call__(self, x):
+        x = np.asarray(x, dtype=np.float32)
+        for weight_t, bias, relu in self.layers:
+            x = x @ weight_t + bias
+            if relu:
+                np.maximum(x, 0, out=x)
+        return x
+
+
+def make_sequences(series, window=WINDOW):
+    series = np.asarray(series, dtype=np.float32)
+    arr = np.lib.stride_tricks.sliding_window_view(series, window).copy()
+    std_val = np.std(arr)
+    if std_val > 0.01:
+        arr = (arr - np.mean(arr)) / std_val
+    return arr
+
+
+def train(series, epochs, out_path, init_path=None, progress=None):
+    import torch
+    import torch.nn as nn
+    from torch.optim import Adam
+
+    torch.set_num_threads(1)
+    model = build_autoencoder()
+    if init_path:
+        model.load_state_dict(torch.load(init_path, weights_only=True))
+
+    arr = make_sequences(series)
+    dataset = torch.from_numpy(arr)
+
+    optimizer = Adam(model.parameters(), lr=0.001)
+    criterion = nn.MSELoss()
+
+    model.train()
+    losses = []
+    for epoch in range(epochs):
+        optimizer.zero_grad()
+        output = model(dataset)
+        loss = criterion(output, dataset)
+        loss.backward()
+        optimizer.step()
+        losses.append(loss.item())
+        if progress:
+            progress(epoch + 1, losses[-1])
+
+    model.eval()
+    torch.save(model.state_dict(), out_path)
+    export_weights(model.state_dict(), weights_path_for(out_path))
+    return {"samples": len(arr), "final_loss": round(losses[-1], 6), "epochs": epochs}
+
+
+def _emit(message):
+    sys.stdout.write(json.dumps(message) + "\n")
+    sys.stdout.flush()
+
+
+def export_model_file(model_path, weights_path=None):
+    import torch
+
+    state_dict = torch.load(model_path, weights_only=True)
+    weights_path = weights_path or weights_path_for(model_path)
+    tmp = weights_path + ".tmp"
+    export_weights(state_dict, tmp)
+    os.replace(tmp, weights_path)
+    return weights_path
+
+
+if __name__ == "__main__" and len(sys.argv) == 3 and sys.argv[1] == "export":
+    print(export_model_file(sys.argv[2]))
+elif __name__ == "__main__":
+    data_path, epochs, out_path = sys.argv[1], int(sys.argv[2]), sys.argv[3]
+    init_path = sys.argv[4] if len(sys.argv) > 4 else None
+    try:
+        result = train(
+            np.load(data_path), epochs, out_path, init_path,
+            progress=lambda epoch, loss: _emit({"epoch": epoch, "loss": loss}),
+        )
+        _emit({"done": True, **result})
+    except Exception as e:
+        _emit({"error": str(e)})
+        sys.exit(1)
@@ -0,0 +1,219 @@
+import os
+import sys
+import json
+import time
+import socket
+import shutil
+import signal
+import tempfile
+import argparse
+import threading
+import subprocess
+import http.client
+from urllib.parse import urlparse
+import numpy as np
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+
+DEFAULT_ROUTES = [
+    "/api/status",
+    "/api/config",
+    "/api/temperatures",
+    "/api/hvac/a/status",
+    "/api/hvac/b/status",
+    "/api/meter/1",
+    "/api/meter/2",
+    "/api/plc/overview",
+]
+WRITE_ROUTE = "POST /api/hvac/b/coil"
+
+
+def free_port():
+    sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    sock.bind(("127.0.0.1", 0))
+    port = sock.getsockname()[1]
+    sock.close()
+    return port
+
+
+def wait_for_http(host, port, path="/health", timeout=30):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        try:
+            conn = http.client.HTTPConnection(host, port, timeout=1)
+            conn.request("GET", path)
+            if conn.getresponse().status == 200:
+                return True
+        except OSError:
+            pass
+        time.sleep(0.2)
+    return False
+
+
+def wait_for_tcp(host, port, timeout=10):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        try:
+            socket.create_connection((host, port), timeout=1).close()
+            return True
+        except OSError:
+            time.sleep(0.1)
+    return False
+
+
+def start_stack(args, data_dir):
+    sim_port = free_port()
+    app_port = free_port()
+    sim_cmd = [
+        sys.executable, os.path.join(BASE_DIR, "plc_simulator.py"),
+        "--port", str(sim_port),
+        "--latency", str(args.latency),
+        "--jitter", str(args.jitter),
+        "--drop-rate", str(args.drop_rate),
+        "--exception-rate", str(args.exception_rate),
+    ]
+    if args.concurrent_plc:
+        sim_cmd.append("--concurrent")
+    env = dict(os.environ, PLC_HOST="127.0.0.1", PLC_PORT=str(sim_port), PORT=str(app_port), ML_DATA_DIR=data_dir)
+    processes = [subprocess.Popen(sim_cmd, cwd=BASE_DIR, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)]
+    if not wait_for_tcp("127.0.0.1", sim_port):
+        raise RuntimeError("模擬器啟動失敗")
+
+    if args.server == "gunicorn":
+        app_cmd = [
+            sys.executable, "-m", "gunicorn", "-c", "gunicorn_config.py",
+            "--bind", f"127.0.0.1:{app_port}", "app:app",
+        ]
+    else:
+        app_cmd = [sys.executable, "app.py"]
+    processes.append(subprocess.Popen(
+        app_cmd, cwd=BASE_DIR, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+    ))
+    if not wait_for_http("127.0.0.1", app_port):
+        stop_stack(processes)
+        raise RuntimeError("應用程式啟動失敗")
+    return f"http://127.0.0.1:{app_port}", processes
+
+
+def stop_stack(processes):
+    for proc in reversed(processes):
+        if proc.poll() is None:
+            proc.send_signal(signal.SIGTERM)
+    for proc in reversed(processes):
+        try:
+            proc.wait(timeout=10)
+        except subprocess.TimeoutExpired:
+            proc.kill()
+
+
+def parse_route(spec):
+    method, _, path = spec.partition(" ")
+    if not path:
+        return "GET", spec
+    return method.upper(), path
+
+
+def run_client(base_url, routes, stop_at, warmup_until, results, index):
+    target = urlparse(base_url)
+    conn = http.client.HTTPConnection(target.hostname, target.port, timeout=30)
+    i = index
+    toggle = False
+    while time.time() < stop_at:
+        spec = routes[i % len(routes)]
+        i += 1
+        method, path = parse_route(spec)
+        body = None
+        headers = {}
+        if method == "POST":
+            toggle = not toggle
+            body = json.dumps({"address": 28, "value": toggle})
+            headers["Content-Type"] = "application/json"
+        started = time.perf_counter()
+        try:
+            conn.request(method, path, body=body, headers=headers)
+            response = conn.getresponse()
+            response.read()
+            status = response.status
+        except (OSError, http.client.HTTPException):
+            conn.close()
+            conn = http.client.HTTPConnection(target.hostname, target.port, timeout=30)
+            status = 0
+        elapsed = time.perf_counter() - started
+        if started >= warmup_until:
+            results.append((spec, elapsed, status))
+    conn.close()
+
+
+def report(results, duration, concurrency):
+    by_route = {}
+    for spec, elapsed, status in results:
+        by_route.setdefault(spec, ([], [0]))
+        by_route[spec][0].append(elapsed)
+        if status == 0 or status >= 500:
+            by_route[spec][1][0] += 1
+
+    header = f"{'route':32} {'reqs':>7} {'req/s':>8} {'p50 ms':>8} {'p90 ms':>8} {'p99 ms':>8} {'max ms':>8} {'errors':>7}"
+    print(f"\n併發 {concurrency}，量測 {duration:.1f}s")
+    print(header)
+    print("-" * len(header))
+    rows = sorted(by_route.items()) + [("TOTAL", ([r[1] for r in results], [sum(v[1][0] for v in by_route.values())]))]
+    for spec, (latencies, errors) in rows:
+        arr = np.array(latencies) * 1000
+        if len(arr) == 0:
+            continue
+        p50, p90, p99 = np.percentile(arr, [50, 90, 99])
+        print(
+            f"{spec:32} {len(arr):7d} {len(arr) / duration:8.1f} "
+            f"{p50:8.2f} {p90:8.2f} {p99:8.2f} {arr.max():8.2f} {errors[0]:7d}"
+        )
+
+
+def main():
+    parser = argparse.ArgumentParser(description="以 PLC 模擬器進行端對端負載測試")
+    parser.add_argument("--url", help="測試既有的伺服器 (不啟動模擬器與應用程式)")
+    parser.add_argument("--server", choices=("waitress", "gunicorn"), default="waitress")
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--duration", type=float, default=10.0)
+    parser.add_argument("--warmup", type=float, default=2.0)
+    parser.add_argument("--routes", help="逗號分隔的路由，POST 以 'POST /path' 表示")
+    parser.add_argument("--writes", action="store_true", help=f"加入寫入路由 ({WRITE_ROUTE}，切換 B箱 Y28)")
+    parser.add_argument("--latency", type=float, default=10.0, help="模擬器回應延遲 (ms)")
+    parser.add_argument("--jitter", type=float, default=2.0, help="模擬器延遲抖動 ± (ms)")
+    parser.add_argument("--drop-rate", type=float, default=0.0)
+    parser.add_argument("--exception-rate", type=float, default=0.0)
+    parser.add_argument("--concurrent-plc", action="store_true", help="模擬器同一連線並行處理請求")
+    args = parser.parse_args()
+
+    routes = [r.strip() for r in args.routes.split(",")] if args.routes else list(DEFAULT_ROUTES)
+    if args.writes:
+        routes.append(WRITE_ROUTE)
+
+    processes = []
+    data_dir = tempfile.mkdtemp(prefix="bench-ml-data-")
+    try:
+        if args.url:
+            base_url = args.url.rstrip("/")
+        else:
+            base_url, processes = start_stack(args, data_dir)
+            print(f"應用程式 {base_url} ({args.server})，模擬器延遲 {args.latency}±{args.jitter} ms")
+
+        results = []
+        started = time.time()
+        warmup_until = time.perf_counter() + args.warmup
+        stop_at = started + args.warmup + args.duration
+        threads = [
+            threading.Thread(target=run_client, args=(base_url, routes, stop_at, warmup_until, results, i))
+            for i in range(args.concurrency)
+        ]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        report(results, args.duration, args.concurrency)
+    finally:
+        stop_stack(processes)
+        shutil.rmtree(data_dir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
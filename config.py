@@ -2,6 +2,17 @@ import os
 
 PLC_HOST = os.environ.get("PLC_HOST", "59.125.52.73")
 PLC_PORT = int(os.environ.get("PLC_PORT", "502"))
+MODBUS_FRESH_WINDOW = float(os.environ.get("MODBUS_FRESH_WINDOW", "0.2"))
+MODBUS_PIPELINE = os.environ.get("MODBUS_PIPELINE", "0") == "1"
+MODBUS_MAX_INFLIGHT = int(os.environ.get("MODBUS_MAX_INFLIGHT", "8"))
+MODBUS_POOL_GROUPS = os.environ.get("MODBUS_POOL_GROUPS", "3;4;meter")
+MODBUS_BREAKER_THRESHOLD = int(os.environ.get("MODBUS_BREAKER_THRESHOLD", "1"))
+MODBUS_BREAKER_PROBE_INTERVAL = float(os.environ.get("MODBUS_BREAKER_PROBE_INTERVAL", "2"))
+MODBUS_BREAKER_MAX_PROBE_INTERVAL = float(os.environ.get("MODBUS_BREAKER_MAX_PROBE_INTERVAL", "30"))
+MODBUS_PRIORITY_AGING = float(os.environ.get("MODBUS_PRIORITY_AGING", "0.5"))
+INGEST_MODE = os.environ.get("INGEST_MODE", "local")
+INGEST_ADDRESS = os.environ.get("INGEST_ADDRESS", "")
+INGEST_AUTHKEY = os.environ.get("INGEST_AUTHKEY", "")
 
 METER1_SLAVE_ID = int(os.environ.get("METER1_SLAVE_ID", "1"))
 METER2_SLAVE_ID = int(os.environ.get("METER2_SLAVE_ID", "2"))
@@ -9,6 +20,32 @@ PLC_A_SLAVE_ID = int(os.environ.get("PLC_A_SLAVE_ID", "3"))
 PLC_B_SLAVE_ID = int(os.environ.get("PLC_B_SLAVE_ID", "4"))
 PLC_TEMP_SLAVE_ID = int(os.environ.get("PLC_TEMP_SLAVE_ID", "3"))
 
+POLL_INTERVAL = float(os.environ.get("POLL_INTERVAL", "2"))
+COIL_POLL_INTERVAL = float(os.environ.get("COIL_POLL_INTERVAL", "1"))
+COIL_POLL_DEADLINE = float(os.environ.get("COIL_POLL_DEADLINE", "0.5"))
+TEMP_POLL_INTERVAL = float(os.environ.get("TEMP_POLL_INTERVAL", "5"))
+TEMP_POLL_DEADLINE = float(os.environ.get("TEMP_POLL_DEADLINE", "2"))
+METER_POLL_INTERVAL = float(os.environ.get("METER_POLL_INTERVAL", "10"))
+METER_POLL_DEADLINE = float(os.environ.get("METER_POLL_DEADLINE", "5"))
+READBACK_DELAY = float(os.environ.get("READBACK_DELAY", "0.05"))
+
+HISTORY_SEGMENT_RECORDS = int(os.environ.get("HISTORY_SEGMENT_RECORDS", "43200"))
+HVAC_SEGMENT_RECORDS = int(os.environ.get(
+    "HVAC_SEGMENT_RECORDS", str(int(HISTORY_SEGMENT_RECORDS * POLL_INTERVAL / COIL_POLL_INTERVAL))
+))
+HISTORY_MAX_SEGMENTS = int(os.environ.get("HISTORY_MAX_SEGMENTS", "90"))
+HISTORY_FSYNC_INTERVAL = float(os.environ.get("HISTORY_FSYNC_INTERVAL", str(POLL_INTERVAL)))
+ROLLUP_TIERS = os.environ.get("ROLLUP_TIERS", "60:10080,900:5760,3600:8760")
+HISTORY_MAX_POINTS = int(os.environ.get("HISTORY_MAX_POINTS", "5000"))
+ANOMALY_WINDOW_SIZE = int(os.environ.get("ANOMALY_WINDOW_SIZE", "30"))
+EQUIPMENT_CHECKPOINT_INTERVAL = float(os.environ.get("EQUIPMENT_CHECKPOINT_INTERVAL", "300"))
+ENERGY_MAX_GAP = float(os.environ.get("ENERGY_MAX_GAP", "60"))
+
+STREAM_MAX_CLIENTS = int(os.environ.get("STREAM_MAX_CLIENTS", "2"))
+STREAM_TEMP_DEADBAND = float(os.environ.get("STREAM_TEMP_DEADBAND", "0.2"))
+STREAM_KEEPALIVE = float(os.environ.get("STREAM_KEEPALIVE", "15"))
+STREAM_MAX_DURATION = float(os.environ.get("STREAM_MAX_DURATION", "600"))
+
 FATEK_Y_OFFSET = 0
 FATEK_X_OFFSET = 1000
 FATEK_M_OFFSET = 2000
@@ -72,6 +109,9 @@ METER2_PARAMS = [
 ]
 
 METER_READ_COUNT = 68
+METER_WORD_SWAP = os.environ.get("METER_WORD_SWAP", "0") == "1"
+
+READ_PLAN_MAX_GAP = int(os.environ.get("READ_PLAN_MAX_GAP", "32"))
 
 TEMP_R_REG = int(os.environ.get("TEMP_R_REG", "1000"))
 TEMP_COUNT = int(os.environ.get("TEMP_COUNT", "12"))
@@ -0,0 +1,200 @@
+import math
+import threading
+import logging
+from datetime import datetime, date
+import numpy as np
+from ts_store import SegmentStore
+from config import ENERGY_MAX_GAP
+
+logger = logging.getLogger(__name__)
+
+HOUR = 3600
+DEMAND_INTERVAL = 900
+POWER_PARAM = "總功率"
+
+ENERGY_RECORD_DTYPE = np.dtype([
+    ("ts", "<f8"),
+    ("meter", "u1"),
+    ("kwh", "<f8"),
+    ("peak_kw", "<f4"),
+    ("peak_demand_kw", "<f4"),
+    ("samples", "<u4"),
+])
+
+
+def power_index(params):
+    return next(i for i, p in enumerate(params) if p["name"] == POWER_PARAM)
+
+
+def local_day(ts):
+    return datetime.fromtimestamp(ts).date()
+
+
+class EnergyAccumulator:
+    def __init__(self, max_gap=ENERGY_MAX_GAP):
+        self.max_gap = max_gap
+        self.prev = None
+        self.hour_start = None
+        self.demand_start = None
+        self._reset_hour()
+        self.demand_kwh = 0.0
+
+    def _reset_hour(self):
+        self.hour_kwh = 0.0
+        self.hour_peak_kw = -math.inf
+        self.hour_peak_demand = 0.0
+        self.hour_samples = 0
+
+    def _roll(self, t, rows):
+        if t >= self.demand_start + DEMAND_INTERVAL:
+            self.hour_peak_demand = max(self.hour_peak_demand, self.demand_kwh * HOUR / DEMAND_INTERVAL)
+            self.demand_start = t - t % DEMAND_INTERVAL
+            self.demand_kwh = 0.0
+        if t >= self.hour_start + HOUR:
+            if self.hour_samples:
+                rows.append(self.current_hour())
+            self.hour_start = t - t % HOUR
+            self._reset_hour()
+
+    def current_hour(self):
+        return {
+            "ts": self.hour_start,
+            "kwh": self.hour_kwh,
+            "peak_kw": self.hour_peak_kw if self.hour_samples else 0.0,
+            "peak_demand_kw": max(self.hour_peak_demand, self.demand_kwh * HOUR / DEMAND_INTERVAL),
+            "samples": self.hour_samples,
+        }
+
+    def add(self, ts, kw):
+        rows = []
+        if self.hour_start is None:
+            self.hour_start = ts - ts % HOUR
+            self.demand_start = ts - ts % DEMAND_INTERVAL
+        valid = kw is not None and math.isfinite(kw)
+        if valid and self.prev is not None and 0 < ts - self.prev[0] <= self.max_gap:
+            a, pa = self.prev
+            while a < ts:
+                boundary = self.demand_start + DEMAND_INTERVAL
+                b = min(ts, boundary)
+                pb = pa + (kw - pa) * (b - a) / (ts - a)
+                energy = (pa + pb) / 2 * (b - a) / HOUR
+                self.demand_kwh += energy
+                self.hour_kwh += energy
+                a, pa = b, pb
+                if b == boundary:
+                    self._roll(boundary, rows)
+        else:
+            self._roll(ts, rows)
+        if valid:
+            self.hour_samples += 1
+            self.hour_peak_kw = max(self.hour_peak_kw, kw)
+            self.prev = (ts, kw)
+        else:
+            self.prev = None
+        return rows
+
+
+class EnergyLedger:
+    def __init__(self, directory, meters, max_gap=ENERGY_MAX_GAP, **store_options):
+        self.store = SegmentStore(directory, "energy", ENERGY_RECORD_DTYPE, **store_options)
+        self.meters = list(meters)
+        self._lock = threading.Lock()
+        self._accumulators = {m: EnergyAccumulator(max_gap) for m in self.meters}
+        self._daily = {}
+        self._last_hour = {}
+        self._load()
+
+    def _load(self):
+        try:
+            for chunk in self.store.iter_chunks():
+                for row in chunk:
+                    fields = ("ts", "kwh", "peak_kw", "peak_demand_kw", "samples")
+                    self._apply(int(row["meter"]), {name: row[name].item() for name in fields})
+        except Exception as e:
+            logger.warning(f"載入用電彙總失敗: {e}")
+
+    def resume_from(self, meter):
+        last = self._last_hour.get(meter)
+        return last + HOUR if last is not None else None
+
+    def _apply(self, meter, row):
+        day = self._daily.setdefault(local_day(row["ts"]), {}).setdefault(meter, {
+            "kwh": 0.0, "peak_kw": 0.0, "peak_demand_kw": 0.0, "hours": {},
+        })
+        day["kwh"] += row["kwh"]
+        day["peak_kw"] = max(day["peak_kw"], row["peak_kw"])
+        day["peak_demand_kw"] = max(day["peak_demand_kw"], row["peak_demand_kw"])
+        day["hours"][row["ts"]] = row
+        self._last_hour[meter] = row["ts"]
+
+    def add(self, meter, ts, kw):
+        with self._lock:
+            rows = self._accumulators[meter].add(ts, kw)
+            for row in rows:
+                self._apply(meter, row)
+        if rows:
+            records = np.array(
+                [(r["ts"], meter, r["kwh"], r["peak_kw"], r["peak_demand_kw"], r["samples"]) for r in rows],
+                dtype=ENERGY_RECORD_DTYPE,
+            )
+            try:
+                self.store.append(records)
+            except Exception as e:
+                logger.warning(f"寫入用電彙總失敗: {e}")
+
+    def _day_summary(self, day, meter, include_hours):
+        stored = self._daily.get(day, {}).get(meter)
+        summary = {"kwh": 0.0, "peak_kw": 0.0, "peak_demand_kw": 0.0}
+        hours = {}
+        if stored:
+            summary.update(kwh=stored["kwh"], peak_kw=stored["peak_kw"], peak_demand_kw=stored["peak_demand_kw"])
+            hours.update(stored["hours"])
+        acc = self._accumulators[meter]
+        if acc.hour_samples and local_day(acc.hour_start) == day:
+            current = hours[acc.hour_start] = acc.current_hour()
+            summary["kwh"] += current["kwh"]
+            summary["peak_kw"] = max(summary["peak_kw"], current["peak_kw"])
+            summary["peak_demand_kw"] = max(summary["peak_demand_kw"], current["peak_demand_kw"])
+        summary = {key: round(value, 3) for key, value in summary.items()}
+        if include_hours:
+            summary["hours"] = [
+                {
+                    "hour": datetime.fromtimestamp(ts).hour,
+                    "ts": ts,
+                    "kwh": round(h["kwh"], 3),
+                    "peak_kw": round(h["peak_kw"], 3),
+                    "peak_demand_kw": round(h["peak_demand_kw"], 3),
+                }
+                for ts, h in sorted(hours.items())
+            ]
+        return summary
+
+    def daily_report(self, day):
+        with self._lock:
+            return {"date": day.isoformat(), "meters": {m: self._day_summary(day, m, True) for m in self.meters}}
+
+    def monthly_report(self, year, month):
+        with self._lock:
+            days = sorted(d for d in self._daily if d.year == year and d.month == month)
+            today = date.today()
+            if today.year == year and today.month == month and today not in days:
+                days.append(today)
+            meters = {}
+            for m in self.meters:
+                summaries = [(d, self._day_summary(d, m, False)) for d in days]
+                meters[m] = {
+                    "kwh": round(sum(s["kwh"] for _, s in summaries), 3),
+                    "peak_kw": max((s["peak_kw"] for _, s in summaries), default=0.0),
+                    "peak_demand_kw": max((s["peak_demand_kw"] for _, s in summaries), default=0.0),
+                    "days": [{"date": d.isoformat(), **s} for d, s in summaries],
+                }
+        return {"month": f"{year:04d}-{month:02d}", "meters": meters}
+
+    def flush(self):
+        self.store.flush()
+
+    def close(self):
+        self.store.close()
+
+    def get_stats(self):
+        return {"hours": self.store.get_stats()["records"], "days": len(self._daily)}
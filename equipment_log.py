@@ -0,0 +1,178 @@
+import time
+import threading
+import logging
+from datetime import datetime, timedelta
+import numpy as np
+from ts_store import SegmentStore
+from config import BOX_A_CHILLERS, BOX_A_DUAL_FANS, BOX_B_FANS, FATEK_Y_OFFSET, EQUIPMENT_CHECKPOINT_INTERVAL
+
+logger = logging.getLogger(__name__)
+
+MAX_COILS = 64
+
+TRANSITION_DTYPE = np.dtype([
+    ("ts", "<f8"),
+    ("box", "u1"),
+    ("mask", "<u8"),
+])
+
+
+def coil_mask(coils):
+    mask = 0
+    for key, value in coils.items():
+        if value:
+            bit = int(key)
+            if bit >= MAX_COILS:
+                raise ValueError(f"線圈編號超過 {MAX_COILS} 位元遮罩範圍: {key}")
+            mask |= 1 << bit
+    return mask
+
+
+def config_devices():
+    devices = []
+    for group, box, items in (
+        ("chiller", "a", BOX_A_CHILLERS),
+        ("dual_fan", "a", BOX_A_DUAL_FANS),
+        ("dual_fan", "b", BOX_B_FANS),
+    ):
+        for item in items:
+            ys = [item[k] for k in ("y", "y_l", "y_h") if k in item]
+            devices.append({
+                "id": f"{box}_y{ys[0]}",
+                "name": item["name"],
+                "box": box,
+                "group": group,
+                "mask": sum(1 << (y - FATEK_Y_OFFSET) for y in ys),
+            })
+    return devices
+
+
+def local_day(ts):
+    return datetime.fromtimestamp(ts).date()
+
+
+def day_start(day):
+    return datetime.combine(day, datetime.min.time()).timestamp()
+
+
+def day_end(day):
+    return day_start(day + timedelta(days=1))
+
+
+class EquipmentLog:
+    def __init__(self, directory, devices, checkpoint_interval=EQUIPMENT_CHECKPOINT_INTERVAL, **store_options):
+        self.store = SegmentStore(directory, "transitions", TRANSITION_DTYPE, **store_options)
+        self.devices = devices
+        self.checkpoint_interval = checkpoint_interval
+        self.max_gap = checkpoint_interval * 2
+        self._by_box = {}
+        for device in devices:
+            self._by_box.setdefault(device["box"], []).append(device)
+        self._lock = threading.Lock()
+        self._state = {}
+        self._daily = {}
+        self._stats = {"samples": 0, "records": 0}
+        self._replay()
+
+    def _replay(self):
+        try:
+            count = 0
+            for chunk in self.store.iter_chunks():
+                for ts, box, mask in zip(chunk["ts"].tolist(), chunk["box"].tolist(), chunk["mask"].tolist()):
+                    self._apply(chr(box), ts, mask)
+                count += len(chunk)
+            if count:
+                logger.info(f"重建設備運轉統計: {count} 筆狀態變化")
+        except Exception as e:
+            logger.warning(f"重建設備運轉統計失敗: {e}")
+
+    def _bucket(self, device_id, day):
+        return self._daily.setdefault(device_id, {}).setdefault(day, [0.0, 0])
+
+    def _credit(self, device_id, start, end):
+        while start < end:
+            day = local_day(start)
+            stop = min(end, day_end(day))
+            self._bucket(device_id, day)[0] += stop - start
+            start = stop
+
+    def _apply(self, box, ts, mask):
+        prev = self._state.get(box)
+        if prev is not None:
+            prev_ts, prev_mask = prev
+            end = min(ts, prev_ts + self.max_gap)
+            for device in self._by_box.get(box, ()):
+                if prev_mask & device["mask"]:
+                    self._credit(device["id"], prev_ts, end)
+                elif mask & device["mask"]:
+                    self._bucket(device["id"], local_day(ts))[1] += 1
+        self._state[box] = (ts, mask)
+
+    def record(self, box, coils, ts=None):
+        ts = time.time() if ts is None else ts
+        mask = coil_mask(coils)
+        with self._lock:
+            self._stats["samples"] += 1
+            prev = self._state.get(box)
+            if prev is not None and prev[1] == mask and ts - prev[0] < self.checkpoint_interval:
+                return False
+            self._apply(box, ts, mask)
+            self._stats["records"] += 1
+        try:
+            self.store.append(np.array((ts, ord(box), mask), dtype=TRANSITION_DTYPE))
+        except Exception as e:
+            logger.warning(f"寫入設備狀態變化失敗: {e}")
+        return True
+
+    def runtime(self, first_day, last_day, now=None):
+        now = time.time() if now is None else now
+        lo = day_start(first_day)
+        hi = min(day_end(last_day), now)
+        result = []
+        with self._lock:
+            for device in self.devices:
+                seconds = 0.0
+                starts = 0
+                for day, (day_seconds, day_starts) in self._daily.get(device["id"], {}).items():
+                    if first_day <= day <= last_day:
+                        seconds += day_seconds
+                        starts += day_starts
+                state = self._state.get(device["box"])
+                running = bool(state is not None and state[1] & device["mask"])
+                if running:
+                    seconds += max(min(hi, state[0] + self.max_gap) - max(lo, state[0]), 0)
+                result.append({
+                    "id": device["id"],
+                    "name": device["name"],
+                    "box": device["box"],
+                    "group": device["group"],
+                    "runtime_hours": round(seconds / 3600, 3),
+                    "starts": starts,
+                    "running": running,
+                })
+        return result
+
+    def transitions(self, box, t_from=None, t_to=None, limit=200):
+        parts = [chunk[chunk["box"] == ord(box)] for chunk in self.store.iter_chunks(t_from, t_to)]
+        records = np.concatenate(parts)[-(limit + 1):] if parts else np.zeros(0, dtype=TRANSITION_DTYPE)
+        result = []
+        prev = None
+        for ts, mask in zip(records["ts"].tolist(), records["mask"].tolist()):
+            changed = mask ^ prev if prev is not None else 0
+            result.append({
+                "ts": ts,
+                "mask": format(mask, "016x"),
+                "changes": {str(bit): bool(mask >> bit & 1) for bit in range(MAX_COILS) if changed >> bit & 1},
+            })
+            prev = mask
+        return result[-limit:]
+
+    def flush(self):
+        self.store.flush()
+
+    def close(self):
+        self.store.close()
+
+    def get_stats(self):
+        store = self.store.get_stats()
+        return {**self._stats, "stored": store["records"], "bytes": store["bytes"]}
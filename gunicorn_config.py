@@ -1,4 +1,7 @@
+import os
 import signal
+import secrets
+import tempfile
 import multiprocessing
 
 bind = "0.0.0.0:5000"
@@ -18,6 +21,19 @@ max_requests_jitter = 50
 
 def on_starting(server):
     signal.signal(signal.SIGWINCH, signal.SIG_IGN)
+    os.environ.setdefault("INGEST_ADDRESS", os.path.join(tempfile.gettempdir(), f"hvac-ingest-{os.getpid()}.sock"))
+    os.environ.setdefault("INGEST_AUTHKEY", secrets.token_hex(16))
+    os.environ["INGEST_MODE"] = "client"
+    from ingest import IngestSupervisor
+
+    server.ingest = IngestSupervisor(os.environ["INGEST_ADDRESS"], os.environ["INGEST_AUTHKEY"])
+    server.ingest.start()
+
+
+def on_exit(server):
+    supervisor = getattr(server, "ingest", None)
+    if supervisor is not None:
+        supervisor.stop()
 
 
 def post_fork(server, worker):
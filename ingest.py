@@ -0,0 +1,406 @@
+import os
+import sys
+import time
+import signal
+import builtins
+import threading
+import subprocess
+import logging
+from multiprocessing.connection import Listener, Client, AuthenticationError
+from plc_poller import snapshot_entry
+
+logger = logging.getLogger(__name__)
+
+INGEST_SCRIPT = os.path.abspath(__file__)
+BUILTIN_EXCEPTIONS = (ConnectionError, TimeoutError, ValueError, TypeError, KeyError, LookupError, RuntimeError)
+
+
+class RemoteError(Exception):
+    pass
+
+
+_remote_types = {}
+
+
+def remote_exception_type(name, base="Exception"):
+    builtin = getattr(builtins, name, None)
+    if builtin in BUILTIN_EXCEPTIONS:
+        return builtin
+    cls = _remote_types.get(name)
+    if cls is None:
+        cls = _remote_types[name] = type(name, (RemoteError, getattr(builtins, base, Exception)), {})
+    return cls
+
+
+def describe_exception(e):
+    base = next((cls.__name__ for cls in type(e).__mro__ if cls in BUILTIN_EXCEPTIONS), "Exception")
+    return type(e).__name__, base, str(e)
+
+
+class RemoteResponse:
+    def __init__(self, result):
+        self.function_code = getattr(result, "function_code", None)
+        self.registers = list(getattr(result, "registers", None) or [])
+        self.bits = list(getattr(result, "bits", None) or [])
+        self._error = bool(hasattr(result, "isError") and result.isError())
+        if hasattr(result, "exception_code"):
+            self.exception_code = result.exception_code
+        self._text = str(result)
+
+    def isError(self):
+        return self._error
+
+    def __str__(self):
+        return self._text
+
+
+class ModbusEndpoint:
+    def __init__(self, manager):
+        self.manager = manager
+
+    def write_coil(self, address, value, device_id):
+        return RemoteResponse(self.manager.write_coil(address, value, device_id))
+
+    def write_coils(self, address, values, device_id):
+        return RemoteResponse(self.manager.write_coils(address, values, device_id))
+
+    def read_holding_registers(self, address, count, device_id):
+        return RemoteResponse(self.manager.read_holding_registers(address, count, device_id))
+
+    def check_connection(self):
+        return self.manager.check_connection()
+
+    def get_stats(self):
+        return self.manager.get_stats()
+
+
+class PollerEndpoint:
+    def __init__(self, poller):
+        self.poller = poller
+
+    def snapshot_since(self, version, epoch=None):
+        snap = self.poller.get_snapshot()
+        if snap["version"] == version and snap["epoch"] == epoch:
+            return {"epoch": epoch, "version": version, "timestamp": snap["timestamp"], "updated": snap["updated"]}
+        return snap
+
+    def wait_for_change(self, version, timeout=None):
+        return self.poller.wait_for_change(version, timeout)
+
+    def apply_optimistic(self, name, updates):
+        return self.poller.apply_optimistic(name, updates)
+
+    def get_stats(self):
+        return self.poller.get_stats()
+
+
+class TrainerEndpoint:
+    def __init__(self, trainer):
+        self.trainer = trainer
+
+    def submit(self, channel, epochs):
+        return self.trainer.submit(channel, epochs).to_dict()
+
+    def get(self, job_id):
+        job = self.trainer.get(job_id)
+        return job.to_dict() if job is not None else None
+
+    def list(self):
+        return [job.to_dict(include_losses=False) for job in self.trainer.list()]
+
+    def cancel(self, job_id):
+        job = self.trainer.cancel(job_id)
+        return job.to_dict() if job is not None else None
+
+
+def build_endpoints(modbus, poller, collector, detector, trainer, registry):
+    return {
+        "modbus": (ModbusEndpoint(modbus), None),
+        "poller": (PollerEndpoint(poller), None),
+        "trainer": (TrainerEndpoint(trainer), None),
+        "collector": (collector, {
+            "get_temperature_series", "get_hvac_series", "query_temperature", "query_hvac", "get_stats",
+            "get_equipment_runtime", "get_equipment_transitions",
+            "query_meter", "get_energy_daily", "get_energy_monthly",
+        }),
+        "detector": (detector, {"get_status", "analyze_latest"}),
+        "metrics": (registry, {"render"}),
+    }
+
+
+class IngestServer:
+    def __init__(self, address, authkey, endpoints):
+        self.address = address
+        self.authkey = authkey.encode()
+        self.endpoints = dict(endpoints)
+        self.endpoints["ingest"] = (self, {"ping"})
+        self._listener = None
+        self._stopped = threading.Event()
+        self._clients = 0
+
+    def ping(self):
+        return {"pid": os.getpid(), "clients": self._clients}
+
+    def _dispatch(self, endpoint, method, args, kwargs):
+        target, allowed = self.endpoints[endpoint]
+        if method.startswith("_") or (allowed is not None and method not in allowed):
+            raise AttributeError(f"不允許的方法: {endpoint}.{method}")
+        return getattr(target, method)(*args, **kwargs)
+
+    def _serve(self, conn):
+        self._clients += 1
+        try:
+            while not self._stopped.is_set():
+                try:
+                    endpoint, method, args, kwargs = conn.recv()
+                except (EOFError, OSError):
+                    break
+                try:
+                    reply = ("ok", self._dispatch(endpoint, method, args, kwargs))
+                except Exception as e:
+                    reply = ("error",) + describe_exception(e)
+                try:
+                    conn.send(reply)
+                except (OSError, ValueError):
+                    break
+        finally:
+            self._clients -= 1
+            conn.close()
+
+    def serve_forever(self):
+        if os.path.exists(self.address):
+            os.unlink(self.address)
+        self._listener = Listener(self.address, family="AF_UNIX", authkey=self.authkey)
+        os.chmod(self.address, 0o600)
+        logger.info(f"資料擷取程序就緒: {self.address} (pid {os.getpid()})")
+        while not self._stopped.is_set():
+            try:
+                conn = self._listener.accept()
+            except AuthenticationError:
+                logger.warning("拒絕未通過驗證的 IPC 連線")
+                continue
+            except OSError:
+                break
+            threading.Thread(target=self._serve, args=(conn,), name="ingest-client", daemon=True).start()
+
+    def stop(self):
+        self._stopped.set()
+        if self._listener is not None:
+            self._listener.close()
+
+
+class IngestClient:
+    def __init__(self, address, authkey):
+        self.address = address
+        self.authkey = authkey.encode()
+        self._local = threading.local()
+
+    def _connect(self):
+        try:
+            conn = Client(self.address, family="AF_UNIX", authkey=self.authkey)
+        except (OSError, EOFError, AuthenticationError) as e:
+            raise ConnectionError(f"無法連線至資料擷取程序: {e}") from e
+        self._local.conn = conn
+        return conn
+
+    def _drop(self):
+        conn = getattr(self._local, "conn", None)
+        self._local.conn = None
+        if conn is not None:
+            try:
+                conn.close()
+            except OSError:
+                pass
+
+    def call(self, endpoint, method, *args, **kwargs):
+        conn = getattr(self._local, "conn", None)
+        try:
+            if conn is None:
+                conn = self._connect()
+            conn.send((endpoint, method, args, kwargs))
+        except (OSError, ValueError):
+            self._drop()
+            conn = self._connect()
+            conn.send((endpoint, method, args, kwargs))
+        try:
+            reply = conn.recv()
+        except (EOFError, OSError) as e:
+            self._drop()
+            raise ConnectionError("資料擷取程序連線中斷") from e
+        if reply[0] == "ok":
+            return reply[1]
+        _, name, base, message = reply
+        raise remote_exception_type(name, base)(message)
+
+
+class RemoteEndpoint:
+    def __init__(self, client, name):
+        self._client = client
+        self._name = name
+
+    def __getattr__(self, method):
+        if method.startswith("_"):
+            raise AttributeError(method)
+
+        def call(*args, **kwargs):
+            return self._client.call(self._name, method, *args, **kwargs)
+        return call
+
+
+class RemotePoller:
+    def __init__(self, client):
+        self._client = client
+        self._snapshot = {
+            "epoch": None, "version": None, "timestamp": None, "values": {}, "errors": {}, "updated": {}, "versions": {}, "pending": {},
+        }
+
+    def get_snapshot(self):
+        cached = self._snapshot
+        snap = self._client.call("poller", "snapshot_since", cached["version"], cached["epoch"])
+        if "values" not in snap:
+            snap = {**cached, **snap}
+        self._snapshot = snap
+        return snap
+
+    def wait_for_change(self, version, timeout=None):
+        snap = self._client.call("poller", "wait_for_change", version, timeout)
+        self._snapshot = snap
+        return snap
+
+    def apply_optimistic(self, name, updates):
+        return self._client.call("poller", "apply_optimistic", name, updates)
+
+    def get(self, name):
+        return snapshot_entry(self.get_snapshot(), name)
+
+    def get_stats(self):
+        return self._client.call("poller", "get_stats")
+
+
+class RemoteJob:
+    def __init__(self, data):
+        self.data = data
+        self.id = data["id"]
+        self.status = data["status"]
+
+    def to_dict(self, include_losses=True):
+        if include_losses:
+            return dict(self.data)
+        return {k: v for k, v in self.data.items() if k != "losses"}
+
+
+class RemoteTrainer:
+    def __init__(self, client):
+        self._client = client
+
+    def _job(self, data):
+        return RemoteJob(data) if data is not None else None
+
+    def submit(self, channel, epochs):
+        return RemoteJob(self._client.call("trainer", "submit", channel, epochs))
+
+    def get(self, job_id):
+        return self._job(self._client.call("trainer", "get", job_id))
+
+    def list(self):
+        return [RemoteJob(d) for d in self._client.call("trainer", "list")]
+
+    def cancel(self, job_id):
+        return self._job(self._client.call("trainer", "cancel", job_id))
+
+
+class RemoteBackend:
+    def __init__(self, address, authkey):
+        self.client = IngestClient(address, authkey)
+        self.modbus = RemoteEndpoint(self.client, "modbus")
+        self.poller = RemotePoller(self.client)
+        self.collector = RemoteEndpoint(self.client, "collector")
+        self.detector = RemoteEndpoint(self.client, "detector")
+        self.metrics = RemoteEndpoint(self.client, "metrics")
+        self.trainer = RemoteTrainer(self.client)
+
+
+class IngestSupervisor:
+    def __init__(self, address, authkey, restart_delay=3):
+        self.address = address
+        self.authkey = authkey
+        self.restart_delay = restart_delay
+        self.process = None
+        self._stopping = threading.Event()
+        self._watcher = None
+
+    def _spawn(self):
+        env = dict(os.environ, INGEST_MODE="server", INGEST_ADDRESS=self.address, INGEST_AUTHKEY=self.authkey)
+        self.process = subprocess.Popen(
+            [sys.executable, INGEST_SCRIPT], cwd=os.path.dirname(INGEST_SCRIPT), env=env,
+        )
+        logger.info(f"啟動資料擷取程序 (pid {self.process.pid})")
+
+    def wait_ready(self, timeout=30):
+        client = IngestClient(self.address, self.authkey)
+        deadline = time.time() + timeout
+        while time.time() < deadline:
+            if self.process.poll() is not None:
+                return False
+            try:
+                client.call("ingest", "ping")
+                client._drop()
+                return True
+            except ConnectionError:
+                time.sleep(0.2)
+        return False
+
+    def _watch(self):
+        while not self._stopping.is_set():
+            self.process.wait()
+            if self._stopping.is_set():
+                return
+            logger.warning(f"資料擷取程序已結束，{self.restart_delay} 秒後重啟")
+            if self._stopping.wait(self.restart_delay):
+                return
+            self._spawn()
+
+    def start(self, timeout=30):
+        self._spawn()
+        ready = self.wait_ready(timeout)
+        if not ready:
+            logger.warning("資料擷取程序尚未就緒，Web worker 將回應 503 直到連線成功")
+        self._watcher = threading.Thread(target=self._watch, name="ingest-supervisor", daemon=True)
+        self._watcher.start()
+        return ready
+
+    def stop(self, timeout=10):
+        self._stopping.set()
+        proc = self.process
+        if proc is None or proc.poll() is not None:
+            return
+        proc.terminate()
+        try:
+            proc.wait(timeout=timeout)
+        except subprocess.TimeoutExpired:
+            proc.kill()
+
+
+def main():
+    os.environ["INGEST_MODE"] = "server"
+    import app
+    from config import INGEST_ADDRESS, INGEST_AUTHKEY
+
+    server = IngestServer(INGEST_ADDRESS, INGEST_AUTHKEY, build_endpoints(
+        app.modbus, app.poller, app.collector, app.detector, app.trainer, app.registry,
+    ))
+
+    def handle_signal(signum, frame):
+        logger.warning(f"資料擷取程序收到信號 {signal.Signals(signum).name}")
+        server.stop()
+        app.shutdown_backend()
+        sys.exit(0)
+
+    signal.signal(signal.SIGTERM, handle_signal)
+    signal.signal(signal.SIGINT, handle_signal)
+    server.serve_forever()
+
+
+if __name__ == "__main__":
+    import ingest
+    ingest.main()
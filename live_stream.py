@@ -0,0 +1,165 @@
+import json
+import time
+import threading
+from plc_poller import poller
+from metrics import registry
+from config import STREAM_MAX_CLIENTS, STREAM_KEEPALIVE, STREAM_MAX_DURATION
+
+
+def flatten_identity(value):
+    return value
+
+
+def flatten_meter(value):
+    return {str(p["r_addr"]): p["value"] for p in value["params"]}
+
+
+def changed_default(old, new):
+    return old != new
+
+
+def temperature_changed(deadband):
+    def changed(old, new):
+        if old.get("error") != new.get("error") or old.get("anomaly") != new.get("anomaly"):
+            return True
+        old_t = old.get("temperature")
+        new_t = new.get("temperature")
+        if old_t is None or new_t is None:
+            return old_t != new_t
+        return abs(new_t - old_t) >= deadband
+    return changed
+
+
+def sse_event(event, data):
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False, separators=(',', ':'))}\n\n"
+
+
+class StreamSession:
+    def __init__(self, channels):
+        self.channels = channels
+        self.version = None
+        self.sent = {}
+        self.sent_errors = {}
+        self.sent_pending = {}
+
+    def _flatten(self, name, value):
+        flatten, _ = self.channels.get(name, (None, None))
+        if flatten is None:
+            return {"value": value}
+        return flatten(value)
+
+    def snapshot(self, snap):
+        self.version = snap["version"]
+        self.sent = {}
+        self.sent_errors = dict(snap["errors"])
+        self.sent_pending = snap.get("pending", {})
+        for name, value in snap["values"].items():
+            if value is not None:
+                self.sent[name] = dict(self._flatten(name, value))
+        return {
+            "version": snap["version"],
+            "timestamp": snap["timestamp"],
+            "values": snap["values"],
+            "errors": {name: error for name, error in snap["errors"].items() if error},
+            "pending": self.sent_pending,
+        }
+
+    def delta(self, snap):
+        changes = {}
+        errors = {}
+        for name, version in snap["versions"].items():
+            if self.version is not None and version <= self.version:
+                continue
+            error = snap["errors"].get(name)
+            if error:
+                if self.sent_errors.get(name) != error:
+                    errors[name] = error
+                self.sent_errors[name] = error
+                self.sent.pop(name, None)
+                continue
+            if self.sent_errors.get(name):
+                errors[name] = None
+            self.sent_errors[name] = None
+
+            _, changed = self.channels.get(name, (None, changed_default))
+            sent = self.sent.setdefault(name, {})
+            diff = {
+                key: item
+                for key, item in self._flatten(name, snap["values"][name]).items()
+                if key not in sent or changed(sent[key], item)
+            }
+            if diff:
+                sent.update(diff)
+                changes[name] = diff
+        self.version = snap["version"]
+        pending = snap.get("pending", {})
+        pending_changed = pending != self.sent_pending
+        self.sent_pending = pending
+        if not changes and not errors and not pending_changed:
+            return None
+        delta = {
+            "version": snap["version"],
+            "timestamp": snap["timestamp"],
+            "changes": changes,
+            "errors": errors,
+        }
+        if pending_changed:
+            delta["pending"] = pending
+        return delta
+
+
+class LiveStream:
+    def __init__(self, poller, max_clients=STREAM_MAX_CLIENTS,
+                 keepalive=STREAM_KEEPALIVE, max_duration=STREAM_MAX_DURATION):
+        self.poller = poller
+        self.max_clients = max_clients
+        self.keepalive = keepalive
+        self.max_duration = max_duration
+        self._channels = {}
+        self._lock = threading.Lock()
+        self._clients = 0
+        self._stats = {"connections": 0, "rejected": 0, "events": 0}
+
+    def register(self, name, flatten=flatten_identity, changed=changed_default):
+        self._channels[name] = (flatten, changed)
+
+    def acquire(self):
+        with self._lock:
+            if self._clients >= self.max_clients:
+                self._stats["rejected"] += 1
+                return None
+            self._clients += 1
+            self._stats["connections"] += 1
+        released = threading.Event()
+
+        def release():
+            if not released.is_set():
+                released.set()
+                with self._lock:
+                    self._clients -= 1
+        return release
+
+    def events(self):
+        session = StreamSession(self._channels)
+        started = time.time()
+        yield "retry: 3000\n\n"
+        yield sse_event("snapshot", session.snapshot(self.poller.get_snapshot()))
+        while True:
+            remaining = self.max_duration - (time.time() - started)
+            if remaining <= 0:
+                break
+            snap = self.poller.wait_for_change(session.version, timeout=min(self.keepalive, remaining))
+            if snap["version"] == session.version:
+                yield ": keepalive\n\n"
+                continue
+            delta = session.delta(snap)
+            if delta is not None:
+                self._stats["events"] += 1
+                yield sse_event("delta", delta)
+
+    def get_stats(self):
+        return {**self._stats, "clients": self._clients, "max_clients": self.max_clients}
+
+
+stream = LiveStream(poller)
+registry.callback("stream_clients", "目前 SSE 串流連線數", (), lambda: {(): stream._clients})
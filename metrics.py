@@ -0,0 +1,146 @@
+import bisect
+import threading
+
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+def format_value(value):
+    if value == float("inf"):
+        return "+Inf"
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+def label_key(item):
+    return tuple(str(v) for v in item[0])
+
+
+def escape_label(value):
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def format_labels(names, values, extra=None):
+    pairs = list(zip(names, values))
+    if extra:
+        pairs.append(extra)
+    if not pairs:
+        return ""
+    body = ",".join(f'{name}="{escape_label(value)}"' for name, value in pairs)
+    return "{" + body + "}"
+
+
+class Counter:
+    kind = "counter"
+
+    def __init__(self, name, help_text, labelnames=()):
+        self.name = name
+        self.help = help_text
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, *labels, amount=1):
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0) + amount
+
+    def render(self):
+        with self._lock:
+            items = sorted(self._values.items(), key=label_key)
+        return [f"{self.name}{format_labels(self.labelnames, labels)} {format_value(v)}" for labels, v in items]
+
+
+class Histogram:
+    kind = "histogram"
+
+    def __init__(self, name, help_text, labelnames=(), buckets=LATENCY_BUCKETS):
+        self.name = name
+        self.help = help_text
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(sorted(buckets))
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value, *labels):
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(labels)
+            if series is None:
+                series = self._series[labels] = [[0] * (len(self.buckets) + 1), 0.0]
+            series[0][index] += 1
+            series[1] += value
+
+    def render(self):
+        with self._lock:
+            items = sorted(
+                ((labels, list(counts), total) for labels, (counts, total) in self._series.items()),
+                key=label_key,
+            )
+        lines = []
+        for labels, counts, total in items:
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += count
+                le = ("le", format_value(bound))
+                lines.append(f"{self.name}_bucket{format_labels(self.labelnames, labels, le)} {cumulative}")
+            label_text = format_labels(self.labelnames, labels)
+            lines.append(f"{self.name}_sum{label_text} {format_value(total)}")
+            lines.append(f"{self.name}_count{label_text} {cumulative}")
+        return lines
+
+
+class CallbackMetric:
+    def __init__(self, name, help_text, labelnames, collect, kind="gauge"):
+        self.kind = kind
+        self.name = name
+        self.help = help_text
+        self.labelnames = tuple(labelnames)
+        self.collect = collect
+
+    def render(self):
+        return [
+            f"{self.name}{format_labels(self.labelnames, labels)} {format_value(value)}"
+            for labels, value in sorted(self.collect().items(), key=label_key)
+        ]
+
+
+class MetricsRegistry:
+    def __init__(self):
+        self._metrics = {}
+
+    def _register(self, metric):
+        existing = self._metrics.get(metric.name)
+        if existing is not None:
+            return existing
+        self._metrics[metric.name] = metric
+        return metric
+
+    def counter(self, name, help_text, labelnames=()):
+        return self._register(Counter(name, help_text, labelnames))
+
+    def histogram(self, name, help_text, labelnames=(), buckets=LATENCY_BUCKETS):
+        return self._register(Histogram(name, help_text, labelnames, buckets))
+
+    def callback(self, name, help_text, labelnames, collect, kind="gauge"):
+        return self._register(CallbackMetric(name, help_text, labelnames, collect, kind))
+
+    def render(self, exclude=()):
+        lines = []
+        for metric in list(self._metrics.values()):
+            if metric.name in exclude:
+                continue
+            try:
+                body = metric.render()
+            except Exception:
+                continue
+            lines.append(f"# HELP {metric.name} {metric.help}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+            lines.extend(body)
+        return "\n".join(lines) + "\n"
+
+
+def metric_names(text):
+    return {line.split()[2] for line in text.splitlines() if line.startswith("# TYPE ")}
+
+
+registry = MetricsRegistry()
@@ -3,171 +3,392 @@ import json
 import time
 import threading
 import logging
+import importlib.util
 import numpy as np
-from collections import deque
-from datetime import datetime
+from ts_store import SegmentStore
+from ring_buffer import RingBuffer
+from rollup import Rollup, parse_tiers, lttb
+from equipment_log import EquipmentLog, config_devices
+from energy import EnergyLedger, power_index
+from autoencoder import NumpyAutoEncoder, export_model_file
+from config import (
+    TEMP_COUNT, HISTORY_SEGMENT_RECORDS, HVAC_SEGMENT_RECORDS, HISTORY_MAX_SEGMENTS, HISTORY_FSYNC_INTERVAL,
+    ROLLUP_TIERS, ANOMALY_WINDOW_SIZE,
+    METER1_SLAVE_ID, METER2_SLAVE_ID, METER1_PARAMS, METER2_PARAMS,
+)
 
 logger = logging.getLogger(__name__)
 
-DATA_DIR = os.path.join(os.path.dirname(__file__), "ml_data")
+DATA_DIR = os.environ.get("ML_DATA_DIR", os.path.join(os.path.dirname(__file__), "ml_data"))
 os.makedirs(DATA_DIR, exist_ok=True)
 
 HISTORY_FILE = os.path.join(DATA_DIR, "history.json")
+SERIES_DIR = os.path.join(DATA_DIR, "series")
+ROLLUP_DIR = os.path.join(SERIES_DIR, "rollup")
 MODEL_FILE = os.path.join(DATA_DIR, "anomaly_model.pt")
+MODEL_WEIGHTS_FILE = os.path.join(DATA_DIR, "anomaly_model.npz")
+
+
+TEMP_RECORD_DTYPE = np.dtype([
+    ("ts", "<f8"),
+    ("temps", "<f4", (TEMP_COUNT,)),
+])
+
+HVAC_RECORD_DTYPE = np.dtype([
+    ("ts", "<f8"),
+    ("box", "u1"),
+    ("on_count", "<u2"),
+    ("total", "<u2"),
+])
+
+
+def meter_record_dtype(count):
+    return np.dtype([
+        ("ts", "<f8"),
+        ("values", "<f4", (count,)),
+    ])
+
+
+def channel_index(channel):
+    try:
+        index = int(channel[2:]) if channel.startswith("CH") else -1
+    except ValueError:
+        return None
+    return index if 0 <= index < TEMP_COUNT else None
 
 
 class DataCollector:
     def __init__(self, max_points=5000):
         self._lock = threading.Lock()
         self.max_points = max_points
-        self.temperature_history = deque(maxlen=max_points)
-        self.hvac_history = deque(maxlen=max_points)
+        self.temperature_history = RingBuffer(max_points, TEMP_RECORD_DTYPE)
+        self.hvac_history = RingBuffer(max_points, HVAC_RECORD_DTYPE)
+        store_options = {
+            "segment_records": HISTORY_SEGMENT_RECORDS,
+            "max_segments": HISTORY_MAX_SEGMENTS,
+            "fsync_interval": HISTORY_FSYNC_INTERVAL,
+        }
+        self.temperature_store = SegmentStore(SERIES_DIR, "temperature", TEMP_RECORD_DTYPE, **store_options)
+        self.hvac_store = SegmentStore(
+            SERIES_DIR, "hvac", HVAC_RECORD_DTYPE, **{**store_options, "segment_records": HVAC_SEGMENT_RECORDS}
+        )
+        self.equipment = EquipmentLog(SERIES_DIR, config_devices(), **store_options)
+        self.meter_params = {METER1_SLAVE_ID: METER1_PARAMS, METER2_SLAVE_ID: METER2_PARAMS}
+        self.meter_stores = {
+            meter: SegmentStore(SERIES_DIR, f"meter{meter}", meter_record_dtype(len(params)), **store_options)
+            for meter, params in self.meter_params.items()
+        }
+        self.energy = EnergyLedger(SERIES_DIR, self.meter_params, **store_options)
+        tiers = parse_tiers(ROLLUP_TIERS)
+        self.temperature_rollup = Rollup(TEMP_COUNT, tiers, ROLLUP_DIR, "temperature")
+        self.hvac_rollups = {box: Rollup(1, tiers, ROLLUP_DIR, f"hvac_{box}") for box in ("a", "b")}
+        self.meter_rollups = {
+            meter: Rollup(len(params), tiers, ROLLUP_DIR, f"meter{meter}") for meter, params in self.meter_params.items()
+        }
+        self._migrate_json_history()
         self._load_history()
+        self._load_rollups()
+        self._resume_energy()
+
+    def _migrate_json_history(self):
+        if not os.path.exists(HISTORY_FILE):
+            return
+        try:
+            with open(HISTORY_FILE, "r") as f:
+                data = json.load(f)
+            temps = np.zeros(len(data.get("temperature", [])), dtype=TEMP_RECORD_DTYPE)
+            for i, item in enumerate(data.get("temperature", [])):
+                temps[i] = (item["timestamp"], self._temperature_row(item.get("channels", {})))
+            hvac = np.array(
+                [(item["timestamp"], ord(item["box"]), item["on_count"], item["total"]) for item in data.get("hvac", [])],
+                dtype=HVAC_RECORD_DTYPE,
+            )
+            self.temperature_store.append(temps)
+            self.hvac_store.append(hvac)
+            self.flush()
+            os.replace(HISTORY_FILE, HISTORY_FILE + ".migrated")
+            logger.info(f"已轉換 history.json: 溫度 {len(temps)} 筆, HVAC {len(hvac)} 筆")
+        except Exception as e:
+            logger.warning(f"轉換 history.json 失敗: {e}")
 
     def _load_history(self):
         try:
-            if os.path.exists(HISTORY_FILE):
-                with open(HISTORY_FILE, "r") as f:
-                    data = json.load(f)
-                for item in data.get("temperature", []):
-                    self.temperature_history.append(item)
-                for item in data.get("hvac", []):
-                    self.hvac_history.append(item)
-                logger.info(f"載入歷史資料: 溫度 {len(self.temperature_history)} 筆, HVAC {len(self.hvac_history)} 筆")
+            self.temperature_history.extend(self.temperature_store.tail(self.max_points))
+            self.hvac_history.extend(self.hvac_store.tail(self.max_points))
+            logger.info(f"載入歷史資料: 溫度 {len(self.temperature_history)} 筆, HVAC {len(self.hvac_history)} 筆")
         except Exception as e:
             logger.warning(f"載入歷史資料失敗: {e}")
 
-    def save_history(self):
+    def _load_rollups(self):
         try:
-            with self._lock:
-                data = {
-                    "temperature": list(self.temperature_history),
-                    "hvac": list(self.hvac_history),
-                }
-            with open(HISTORY_FILE, "w") as f:
-                json.dump(data, f)
+            now = time.time()
+            for chunk in self.temperature_store.iter_chunks(self.temperature_rollup.restore(now)):
+                self.temperature_rollup.load(chunk["ts"], chunk["temps"])
+            for box, rollup in self.hvac_rollups.items():
+                for chunk in self.hvac_store.iter_chunks(rollup.restore(now)):
+                    chunk = chunk[chunk["box"] == ord(box)]
+                    rollup.load(chunk["ts"], chunk["on_count"])
+            for meter, rollup in self.meter_rollups.items():
+                for chunk in self.meter_stores[meter].iter_chunks(rollup.restore(now)):
+                    rollup.load(chunk["ts"], chunk["values"])
+        except Exception as e:
+            logger.warning(f"建立彙總資料失敗: {e}")
+
+    def _resume_energy(self):
+        try:
+            for meter, store in self.meter_stores.items():
+                index = power_index(self.meter_params[meter])
+                for chunk in store.iter_chunks(self.energy.resume_from(meter)):
+                    for ts, kw in zip(chunk["ts"].tolist(), chunk["values"][:, index].tolist()):
+                        self.energy.add(meter, ts, kw)
+        except Exception as e:
+            logger.warning(f"補算用電量失敗: {e}")
+
+    def _temperature_row(self, channels):
+        row = np.full(TEMP_COUNT, np.nan, dtype=np.float32)
+        for name, ch_data in channels.items():
+            index = channel_index(name)
+            temp = ch_data.get("temperature")
+            if index is not None and temp is not None:
+                row[index] = temp
+        return row
+
+    def flush(self):
+        try:
+            self.temperature_store.flush()
+            self.hvac_store.flush()
+            self.equipment.flush()
+            self.energy.flush()
+            for store in self.meter_stores.values():
+                store.flush()
+            for rollup in self._rollups():
+                rollup.flush()
         except Exception as e:
             logger.warning(f"儲存歷史資料失敗: {e}")
 
+    def close(self):
+        self.temperature_store.close()
+        self.hvac_store.close()
+        self.equipment.close()
+        self.energy.close()
+        for store in self.meter_stores.values():
+            store.close()
+        for rollup in self._rollups():
+            rollup.close()
+
+    def _rollups(self):
+        return [self.temperature_rollup, *self.hvac_rollups.values(), *self.meter_rollups.values()]
+
+    def get_stats(self):
+        return {
+            "temperature_records": len(self.temperature_history),
+            "hvac_records": len(self.hvac_history),
+            "equipment": self.equipment.get_stats(),
+            "meter_records": {meter: store.get_stats()["records"] for meter, store in self.meter_stores.items()},
+            "energy": self.energy.get_stats(),
+        }
+
     def record_temperature(self, channels):
+        record = np.array((time.time(), self._temperature_row(channels)), dtype=TEMP_RECORD_DTYPE)
         with self._lock:
-            entry = {
-                "timestamp": time.time(),
-                "time_str": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
-                "channels": channels,
-            }
-            self.temperature_history.append(entry)
+            self.temperature_history.append(record)
+            self.temperature_rollup.add(float(record["ts"]), record["temps"])
+        try:
+            self.temperature_store.append(record)
+        except Exception as e:
+            logger.warning(f"寫入溫度歷史失敗: {e}")
 
     def record_hvac(self, box, coils):
+        on_count = sum(1 for v in coils.values() if v)
+        record = np.array((time.time(), ord(box), on_count, len(coils)), dtype=HVAC_RECORD_DTYPE)
         with self._lock:
-            on_count = sum(1 for v in coils.values() if v)
-            entry = {
-                "timestamp": time.time(),
-                "time_str": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
-                "box": box,
-                "on_count": on_count,
-                "total": len(coils),
-            }
-            self.hvac_history.append(entry)
+            self.hvac_history.append(record)
+            if box in self.hvac_rollups:
+                self.hvac_rollups[box].add(float(record["ts"]), on_count)
+        try:
+            self.hvac_store.append(record)
+        except Exception as e:
+            logger.warning(f"寫入 HVAC 歷史失敗: {e}")
+        self.equipment.record(box, coils, float(record["ts"]))
+
+    def record_meter(self, meter, values):
+        row = np.array([np.nan if v is None else v for v in values], dtype=np.float32)
+        record = np.array((time.time(), row), dtype=self.meter_stores[meter].dtype)
+        with self._lock:
+            self.meter_rollups[meter].add(float(record["ts"]), record["values"])
+        try:
+            self.meter_stores[meter].append(record)
+        except Exception as e:
+            logger.warning(f"寫入電表歷史失敗: {e}")
+        self.energy.add(meter, float(record["ts"]), float(row[power_index(self.meter_params[meter])]))
+
+    def query_meter(self, meter, index, t_from, t_to, max_points, mode="auto"):
+        return self._query_range(
+            self.meter_stores[meter],
+            lambda chunk: (chunk["ts"], chunk["values"][:, index]),
+            self.meter_rollups[meter], index, t_from, t_to, max_points, mode,
+        )
+
+    def get_energy_daily(self, day):
+        return self.energy.daily_report(day)
+
+    def get_energy_monthly(self, year, month):
+        return self.energy.monthly_report(year, month)
+
+    def get_equipment_runtime(self, first_day, last_day):
+        return self.equipment.runtime(first_day, last_day)
+
+    def get_equipment_transitions(self, box, t_from=None, t_to=None, limit=200):
+        return self.equipment.transitions(box, t_from, t_to, limit)
 
     def get_temperature_series(self, channel="CH0", limit=200):
+        index = channel_index(channel)
+        if index is None:
+            return np.zeros(0), np.zeros(0, dtype=np.float32)
         with self._lock:
-            series = []
-            for entry in self.temperature_history:
-                ch_data = entry.get("channels", {}).get(channel, {})
-                temp = ch_data.get("temperature")
-                if temp is not None:
-                    series.append({
-                        "timestamp": entry["timestamp"],
-                        "time_str": entry["time_str"],
-                        "value": temp,
-                    })
-            return series[-limit:]
+            records = self.temperature_history.last()
+            values = records["temps"][:, index]
+            valid = ~np.isnan(values)
+            return records["ts"][valid][-limit:], values[valid][-limit:]
 
     def get_hvac_series(self, box="a", limit=200):
         with self._lock:
-            series = []
-            for entry in self.hvac_history:
-                if entry.get("box") == box:
-                    series.append({
-                        "timestamp": entry["timestamp"],
-                        "time_str": entry["time_str"],
-                        "on_count": entry["on_count"],
-                        "total": entry["total"],
-                    })
-            return series[-limit:]
+            records = self.hvac_history.last()
+            return records[records["box"] == ord(box)][-limit:]
+
+    def _query_range(self, store, extract, rollup, column, t_from, t_to, max_points, mode):
+        with self._lock:
+            firsts = [t for t in (store.first_ts(), rollup.first_ts()) if t is not None]
+        if firsts:
+            t_from = max(t_from, min(firsts))
+        parts = [extract(chunk) for chunk in store.iter_chunks(t_from, t_to)]
+        raw_count = sum(len(p[0]) for p in parts)
+        if raw_count > max_points and mode != "lttb":
+            with self._lock:
+                tier = rollup.pick(t_from, t_to, max_points)
+                if tier is not None:
+                    data = tier.query(t_from, t_to, column)
+                    return {"resolution": tier.label, **data}
+
+        ts = np.concatenate([p[0] for p in parts]) if parts else np.zeros(0)
+        values = np.concatenate([p[1] for p in parts]).astype(np.float64) if parts else np.zeros(0)
+        valid = ~np.isnan(values)
+        ts, values = ts[valid], values[valid]
+        resolution = "raw"
+        if len(ts) > max_points:
+            selected = lttb(ts, values, max_points)
+            ts, values = ts[selected], values[selected]
+            resolution = "lttb"
+        return {"resolution": resolution, "ts": ts, "avg": values}
+
+    def query_temperature(self, channel, t_from, t_to, max_points, mode="auto"):
+        index = channel_index(channel)
+        if index is None:
+            return {"resolution": "raw", "ts": np.zeros(0), "avg": np.zeros(0)}
+        return self._query_range(
+            self.temperature_store,
+            lambda chunk: (chunk["ts"], chunk["temps"][:, index]),
+            self.temperature_rollup, index, t_from, t_to, max_points, mode,
+        )
+
+    def query_hvac(self, box, t_from, t_to, max_points, mode="auto"):
+        if box not in self.hvac_rollups:
+            return {"resolution": "raw", "ts": np.zeros(0), "avg": np.zeros(0)}
+
+        def extract(chunk):
+            chunk = chunk[chunk["box"] == ord(box)]
+            return chunk["ts"], chunk["on_count"]
+
+        return self._query_range(
+            self.hvac_store, extract, self.hvac_rollups[box], 0, t_from, t_to, max_points, mode,
+        )
+
+
+class SlidingStats:
+    def __init__(self, window_size):
+        self.window = RingBuffer(window_size, np.float64)
+        self.mean = 0.0
+        self.m2 = 0.0
+        self._replaced = 0
+
+    def __len__(self):
+        return len(self.window)
+
+    def last(self, n=None):
+        return self.window.last(n)
+
+    def push(self, value):
+        value = float(value)
+        n = len(self.window)
+        if n < self.window.capacity:
+            n += 1
+            delta = value - self.mean
+            self.mean += delta / n
+            self.m2 += delta * (value - self.mean)
+        else:
+            oldest = float(self.window.last(n)[0])
+            old_mean = self.mean
+            self.mean += (value - oldest) / n
+            self.m2 += (value - oldest) * (value - self.mean + oldest - old_mean)
+            self._replaced += 1
+        self.window.append(value)
+        if self._replaced >= self.window.capacity:
+            self._recompute()
+
+    def _recompute(self):
+        values = self.window.last()
+        self.mean = float(values.mean())
+        self.m2 = float(((values - self.mean) ** 2).sum())
+        self._replaced = 0
+
+    def std(self):
+        n = len(self.window)
+        return (max(self.m2, 0.0) / n) ** 0.5 if n else 0.0
 
 
 class AnomalyDetector:
-    def __init__(self, window_size=30, z_threshold=2.5):
+    def __init__(self, window_size=ANOMALY_WINDOW_SIZE, z_threshold=2.5):
         self._lock = threading.Lock()
         self.window_size = window_size
         self.z_threshold = z_threshold
         self.channel_windows = {}
-        self.torch_model = None
-        self._torch_available = False
-        self._torch_initialized = False
+        self.model = None
+        self._model_initialized = False
+
+    def torch_available(self):
+        return importlib.util.find_spec("torch") is not None
 
-    def _ensure_torch(self):
-        if self._torch_initialized:
+    def _ensure_model(self):
+        if self._model_initialized:
             return
-        self._torch_initialized = True
+        self._model_initialized = True
         try:
-            import torch
-            import torch.nn as nn
-
-            class AutoEncoder(nn.Module):
-                def __init__(self, input_dim=10):
-                    super().__init__()
-                    self.encoder = nn.Sequential(
-                        nn.Linear(input_dim, 8),
-                        nn.ReLU(),
-                        nn.Linear(8, 4),
-                        nn.ReLU(),
-                        nn.Linear(4, 2),
-                    )
-                    self.decoder = nn.Sequential(
-                        nn.Linear(2, 4),
-                        nn.ReLU(),
-                        nn.Linear(4, 8),
-                        nn.ReLU(),
-                        nn.Linear(8, input_dim),
-                    )
-
-                def forward(self, x):
-                    encoded = self.encoder(x)
-                    decoded = self.decoder(encoded)
-                    return decoded
-
-            self.torch_model = AutoEncoder(input_dim=10)
-            self.torch_model.eval()
-
-            if os.path.exists(MODEL_FILE):
-                self.torch_model.load_state_dict(torch.load(MODEL_FILE, weights_only=True))
+            if not os.path.exists(MODEL_WEIGHTS_FILE) and os.path.exists(MODEL_FILE):
+                export_model_file(MODEL_FILE, MODEL_WEIGHTS_FILE)
+                logger.info("已將 anomaly_model.pt 匯出為 NumPy 權重檔")
+            if os.path.exists(MODEL_WEIGHTS_FILE):
+                self.model = NumpyAutoEncoder.load(MODEL_WEIGHTS_FILE)
                 logger.info("載入已訓練的異常偵測模型")
             else:
-                logger.info("PyTorch 異常偵測模型初始化完成 (未訓練)")
-
-            self._torch_available = True
+                logger.info("異常偵測模型尚未訓練，僅使用統計方法")
         except Exception as e:
-            logger.warning(f"PyTorch 初始化失敗，使用統計方法: {e}")
-            self._torch_available = False
+            logger.warning(f"載入異常偵測模型失敗，使用統計方法: {e}")
+            self.model = None
 
     def update(self, channel, value):
         with self._lock:
             if channel not in self.channel_windows:
-                self.channel_windows[channel] = deque(maxlen=self.window_size)
-            self.channel_windows[channel].append(value)
+                self.channel_windows[channel] = SlidingStats(self.window_size)
+            self.channel_windows[channel].push(value)
 
     def check_statistical(self, channel, value):
         with self._lock:
-            window = self.channel_windows.get(channel)
-            if not window or len(window) < 5:
+            stats = self.channel_windows.get(channel)
+            if not stats or len(stats) < 5:
                 return {"anomaly": False, "reason": None, "confidence": 0}
 
-            values = list(window)
-            mean = np.mean(values)
-            std = np.std(values)
+            mean = stats.mean
+            std = stats.std()
 
             if std < 0.1:
                 if abs(value - mean) > 1:
@@ -199,127 +420,90 @@ class AnomalyDetector:
                 "z_score": round(float(z_score), 2),
             }
 
-    def check_torch(self, channel):
-        self._ensure_torch()
-        if not self._torch_available:
-            return None
-
+    def check_autoencoder_batch(self, channels):
+        self._ensure_model()
         with self._lock:
-            window = self.channel_windows.get(channel)
-            if not window or len(window) < 10:
-                return None
+            model = self.model
+            if model is None:
+                return {}
+            eligible = []
+            rows = []
+            for channel in channels:
+                stats = self.channel_windows.get(channel)
+                if stats and len(stats) >= 10:
+                    eligible.append(channel)
+                    rows.append(stats.last(10))
+        if not eligible:
+            return {}
 
         try:
-            import torch
-
-            values = list(window)[-10:]
-            arr = np.array(values, dtype=np.float32)
-
-            if np.std(arr) > 0.01:
-                arr = (arr - np.mean(arr)) / np.std(arr)
-            else:
-                arr = arr - np.mean(arr)
+            arr = np.array(rows, dtype=np.float32)
+            arr -= arr.mean(axis=1, keepdims=True)
+            std = arr.std(axis=1, keepdims=True)
+            np.divide(arr, std, out=arr, where=std > 0.01)
 
-            tensor = torch.FloatTensor(arr).unsqueeze(0)
-
-            with torch.no_grad():
-                reconstructed = self.torch_model(tensor)
-                loss = torch.nn.functional.mse_loss(reconstructed, tensor).item()
+            reconstructed = model(arr)
+            losses = ((reconstructed - arr) ** 2).mean(axis=1).tolist()
 
             return {
-                "reconstruction_error": round(loss, 4),
-                "anomaly": loss > 0.5,
-                "confidence": min(loss / 1.0, 1.0) if loss > 0.5 else 0,
+                channel: {
+                    "reconstruction_error": round(loss, 4),
+                    "anomaly": loss > 0.5,
+                    "confidence": min(loss / 1.0, 1.0) if loss > 0.5 else 0,
+                }
+                for channel, loss in zip(eligible, losses)
             }
         except Exception as e:
-            logger.debug(f"PyTorch 推論錯誤: {e}")
-            return None
-
-    def train_model(self, data_collector, channel="CH0", epochs=50):
-        self._ensure_torch()
-        if not self._torch_available:
-            return {"success": False, "reason": "PyTorch 不可用"}
-
-        series = data_collector.get_temperature_series(channel, limit=1000)
-        if len(series) < 20:
-            return {"success": False, "reason": f"資料不足 (需要 20 筆以上，目前 {len(series)} 筆)"}
-
-        try:
-            import torch
-            import torch.nn as nn
-            from torch.optim import Adam
-
-            values = [s["value"] for s in series]
-            sequences = []
-            for i in range(len(values) - 10 + 1):
-                seq = values[i:i + 10]
-                sequences.append(seq)
-
-            arr = np.array(sequences, dtype=np.float32)
-            mean_val = np.mean(arr)
-            std_val = np.std(arr)
-            if std_val > 0.01:
-                arr = (arr - mean_val) / std_val
-
-            dataset = torch.FloatTensor(arr)
-
-            optimizer = Adam(self.torch_model.parameters(), lr=0.001)
-            criterion = nn.MSELoss()
+            logger.debug(f"AutoEncoder 推論錯誤: {e}")
+            return {}
 
-            self.torch_model.train()
-            losses = []
-            for epoch in range(epochs):
-                optimizer.zero_grad()
-                output = self.torch_model(dataset)
-                loss = criterion(output, dataset)
-                loss.backward()
-                optimizer.step()
-                losses.append(loss.item())
-
-            self.torch_model.eval()
-
-            torch.save(self.torch_model.state_dict(), MODEL_FILE)
-
-            return {
-                "success": True,
-                "samples": len(sequences),
-                "final_loss": round(losses[-1], 6),
-                "epochs": epochs,
+    def install_model(self, model_path, weights_path):
+        model = NumpyAutoEncoder.load(weights_path)
+        os.replace(model_path, MODEL_FILE)
+        os.replace(weights_path, MODEL_WEIGHTS_FILE)
+        with self._lock:
+            self.model = model
+            self._model_initialized = True
+        logger.info("已套用新訓練的異常偵測模型")
+
+    def analyze_batch(self, values, update=True):
+        results = {}
+        for channel, value in values.items():
+            if update:
+                self.update(channel, value)
+            results[channel] = {
+                "channel": channel,
+                "value": value,
+                "statistical": self.check_statistical(channel, value),
             }
-        except Exception as e:
-            logger.error(f"模型訓練失敗: {e}")
-            return {"success": False, "reason": str(e)}
-
-    def analyze(self, channel, value):
-        self.update(channel, value)
 
-        result = {
-            "channel": channel,
-            "value": value,
-            "statistical": self.check_statistical(channel, value),
+        autoencoder_results = self.check_autoencoder_batch(list(values))
+        for channel, result in results.items():
+            autoencoder_result = autoencoder_results.get(channel)
+            if autoencoder_result:
+                result["autoencoder"] = autoencoder_result
+            result["is_anomaly"] = (
+                result["statistical"]["anomaly"]
+                or (autoencoder_result is not None and autoencoder_result.get("anomaly", False))
+            )
+
+        return results
+
+    def analyze_latest(self):
+        latest = {
+            channel: float(stats.last(1)[0])
+            for channel, stats in list(self.channel_windows.items())
+            if len(stats) > 0
         }
+        return self.analyze_batch(latest, update=False)
 
-        torch_result = self.check_torch(channel)
-        if torch_result:
-            result["autoencoder"] = torch_result
-
-        result["is_anomaly"] = (
-            result["statistical"]["anomaly"]
-            or (torch_result is not None and torch_result.get("anomaly", False))
-        )
-
-        return result
+    def get_status(self):
+        return {
+            "torch_available": self.torch_available(),
+            "model_loaded": self.model is not None,
+            "channels_tracked": list(self.channel_windows.keys()),
+        }
 
 
 collector = DataCollector()
 detector = AnomalyDetector()
-
-
-def save_periodic():
-    while True:
-        time.sleep(60)
-        collector.save_history()
-
-
-_save_thread = threading.Thread(target=save_periodic, daemon=True)
-_save_thread.start()
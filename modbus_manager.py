@@ -1,12 +1,48 @@
+import heapq
 import threading
 import time
 import logging
+from concurrent.futures import ThreadPoolExecutor
 from pymodbus.client import ModbusTcpClient
 from pymodbus.pdu import ExceptionResponse
-from config import PLC_HOST, PLC_PORT
+from modbus_pipeline import PipelinedModbusClient
+from metrics import registry
+from config import (
+    PLC_HOST, PLC_PORT, PLC_A_SLAVE_ID,
+    MODBUS_FRESH_WINDOW, MODBUS_PIPELINE, MODBUS_MAX_INFLIGHT, MODBUS_POOL_GROUPS,
+    MODBUS_BREAKER_THRESHOLD, MODBUS_BREAKER_PROBE_INTERVAL, MODBUS_BREAKER_MAX_PROBE_INTERVAL,
+    MODBUS_PRIORITY_AGING,
+)
 
 logger = logging.getLogger(__name__)
 
+REQUEST_SECONDS = registry.histogram(
+    "modbus_request_seconds", "Modbus 單次交易往返時間", ("unit", "fc", "result"),
+)
+LOCK_WAIT_SECONDS = registry.histogram(
+    "modbus_lock_wait_seconds", "依優先等級等待連線排程的時間", ("connection", "priority"),
+)
+RETRIES = registry.histogram(
+    "modbus_retries", "每次 execute 的重試次數", ("connection",), buckets=(0, 1, 2, 3),
+)
+CONNECT_SECONDS = registry.histogram(
+    "modbus_connect_seconds", "建立 TCP 連線耗時", ("connection", "result"),
+)
+FAST_FAILS = registry.counter(
+    "modbus_breaker_fast_fails_total", "斷路器開啟時直接拒絕的呼叫數", ("connection",),
+)
+
+PRIORITY_WRITE = 0
+PRIORITY_READ = 1
+PRIORITY_POLL = 2
+PRIORITY_NAMES = ("write", "read", "poll")
+
+READ_FUNCTION_CODES = {"read_coils": 1, "read_holding_registers": 3, "read_input_registers": 4}
+
+BREAKER_CLOSED = "closed"
+BREAKER_OPEN = "open"
+BREAKER_HALF_OPEN = "half_open"
+
 MODBUS_EXCEPTION_CODES = {
     1: "不合法的功能碼",
     2: "不合法的資料位址 - 該位址不存在",
@@ -18,13 +54,191 @@ MODBUS_EXCEPTION_CODES = {
 
 
 def parse_modbus_error(result):
-    if isinstance(result, ExceptionResponse):
+    if isinstance(result, ExceptionResponse) or hasattr(result, "exception_code"):
         fc = result.function_code - 0x80 if result.function_code >= 0x80 else result.function_code
         msg = MODBUS_EXCEPTION_CODES.get(result.exception_code, f"未知錯誤碼 {result.exception_code}")
         return f"Modbus 錯誤 (FC{fc}): {msg}"
     return f"Modbus 錯誤: {result}"
 
 
+class ModbusResponseError(Exception):
+    pass
+
+
+class CircuitOpenError(ConnectionError):
+    pass
+
+
+def check_response(result):
+    if isinstance(result, Exception):
+        raise result
+    if hasattr(result, 'isError') and result.isError():
+        raise ModbusResponseError(parse_modbus_error(result))
+    return result
+
+
+
+LANE_METER = "meter"
+LANE_DEVICES = {LANE_METER: PLC_A_SLAVE_ID}
+
+
+def parse_pool_groups(spec):
+    groups = []
+    for part in spec.split(";"):
+        keys = [x.strip() for x in part.split(",") if x.strip()]
+        keys = [int(x) if x.isdigit() else x for x in keys]
+        for key in keys:
+            if isinstance(key, str) and key not in LANE_DEVICES:
+                raise ValueError(f"MODBUS_POOL_GROUPS 含未知的通道名稱: {key}")
+        if keys:
+            groups.append(keys)
+    return groups
+
+
+class _Flight:
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+        self.finished = 0
+
+
+class _Waiter:
+    __slots__ = ("key", "seq", "priority", "event")
+
+    def __init__(self, key, seq, priority):
+        self.key = key
+        self.seq = seq
+        self.priority = priority
+        self.event = threading.Event()
+
+    def __lt__(self, other):
+        return (self.key, self.seq) < (other.key, other.seq)
+
+
+class PriorityGate:
+    def __init__(self, capacity=1, aging=MODBUS_PRIORITY_AGING):
+        self.capacity = capacity
+        self.aging = aging
+        self._lock = threading.Lock()
+        self._waiters = []
+        self._active = 0
+        self._seq = 0
+        self._stats = [
+            {"queued": 0, "max_queued": 0, "acquired": 0, "wait_total": 0.0, "wait_max": 0.0}
+            for _ in PRIORITY_NAMES
+        ]
+
+    def acquire(self, priority=PRIORITY_READ, blocking=True):
+        started = time.perf_counter()
+        stats = self._stats[priority]
+        with self._lock:
+            if self._active < self.capacity and not self._waiters:
+                self._active += 1
+                waiter = None
+            elif not blocking:
+                return False
+            else:
+                self._seq += 1
+                waiter = _Waiter(started + priority * self.aging, self._seq, priority)
+                heapq.heappush(self._waiters, waiter)
+                stats["queued"] += 1
+                stats["max_queued"] = max(stats["max_queued"], stats["queued"])
+        if waiter is not None:
+            waiter.event.wait()
+        waited = time.perf_counter() - started
+        with self._lock:
+            stats["acquired"] += 1
+            stats["wait_total"] += waited
+            stats["wait_max"] = max(stats["wait_max"], waited)
+        return waited
+
+    def release(self):
+        with self._lock:
+            if self._waiters:
+                waiter = heapq.heappop(self._waiters)
+                self._stats[waiter.priority]["queued"] -= 1
+                waiter.event.set()
+            else:
+                self._active -= 1
+
+    def __enter__(self):
+        self.acquire(PRIORITY_WRITE)
+        return self
+
+    def __exit__(self, *exc):
+        self.release()
+
+    def depth(self):
+        return {name: self._stats[i]["queued"] for i, name in enumerate(PRIORITY_NAMES)}
+
+    def get_stats(self):
+        with self._lock:
+            return {
+                "capacity": self.capacity,
+                "active": self._active,
+                **{
+                    name: {
+                        "queued": s["queued"],
+                        "max_queued": s["max_queued"],
+                        "acquired": s["acquired"],
+                        "avg_wait_ms": round(s["wait_total"] / s["acquired"] * 1000, 3) if s["acquired"] else 0,
+                        "max_wait_ms": round(s["wait_max"] * 1000, 3),
+                    }
+                    for name, s in zip(PRIORITY_NAMES, self._stats)
+                },
+            }
+
+
+class _Connection:
+    def __init__(self, name, device_ids, pipeline=False):
+        self.name = name
+        self.device_ids = device_ids
+        self.client = None
+        if pipeline:
+            self.lock = threading.Lock()
+            self.gate = PriorityGate(MODBUS_MAX_INFLIGHT)
+        else:
+            self.lock = self.gate = PriorityGate(1)
+        self.connect_time = 0
+        self.fail_count = 0
+        self.reconnects = 0
+        self.last_error = None
+        self.last_success = None
+        self.breaker = BREAKER_CLOSED
+        self.consecutive_failures = 0
+        self.opened_at = None
+        self.open_error = None
+        self.probe_delay = MODBUS_BREAKER_PROBE_INTERVAL
+        self.next_probe = 0
+        self.trips = 0
+        self.fast_fails = 0
+
+    def is_connected(self):
+        client = self.client
+        return self.breaker == BREAKER_CLOSED and client is not None and client.connected
+
+    def get_stats(self):
+        return {
+            "device_ids": self.device_ids,
+            "connected": self.is_connected(),
+            "breaker": {
+                "state": self.breaker,
+                "opened_at": self.opened_at,
+                "error": self.open_error,
+                "next_probe": self.next_probe if self.breaker != BREAKER_CLOSED else None,
+                "trips": self.trips,
+                "fast_fails": self.fast_fails,
+            },
+            "queue": self.gate.get_stats(),
+            "fail_count": self.fail_count,
+            "reconnects": self.reconnects,
+            "last_error": self.last_error,
+            "last_success": self.last_success,
+            "uptime": time.time() - self.connect_time if self.connect_time > 0 else 0,
+        }
+
+
 class ModbusManager:
     _instance = None
     _lock = threading.Lock()
@@ -41,146 +255,604 @@ class ModbusManager:
         if self._initialized:
             return
         self._initialized = True
-        self._client = None
-        self._client_lock = threading.Lock()
-        self._connect_time = 0
-        self._fail_count = 0
         self._max_retries = 3
         self._base_timeout = 3
         self._max_backoff = 10
+        self._flights = {}
+        self._flights_lock = threading.Lock()
+        self._fresh_window = MODBUS_FRESH_WINDOW
+        self._pipeline = MODBUS_PIPELINE
+        self._pool_lock = threading.Lock()
+        self._breaker_lock = threading.Lock()
+        self._prober = None
+        self._probe_wakeup = threading.Event()
+        self._closing = False
+        self._connections = {}
+        self._routes = {}
+        for ids in parse_pool_groups(MODBUS_POOL_GROUPS):
+            self._add_connection(ids)
+        if not self._connections:
+            self._default = _Connection("shared", [], self._pipeline)
+            self._connections["shared"] = self._default
+        else:
+            self._default = None
+        self._batch_executor = None
+        if self._pipeline:
+            self._batch_executor = ThreadPoolExecutor(
+                max_workers=max(len(self._connections), 2), thread_name_prefix="modbus-batch"
+            )
         self._stats = {
             "total_requests": 0,
             "successful": 0,
             "failed": 0,
             "reconnects": 0,
+            "coalesced": 0,
+            "fast_failed": 0,
             "last_error": None,
             "last_success": None,
         }
-        logger.info(f"ModbusManager 初始化: {PLC_HOST}:{PLC_PORT}")
+        mode = f"管線模式 (最多 {MODBUS_MAX_INFLIGHT} 筆並行)" if self._pipeline else "同步模式"
+        logger.info(f"ModbusManager 初始化: {PLC_HOST}:{PLC_PORT} {mode}, 連線池 {list(self._connections)}")
+
+    def _add_connection(self, keys):
+        name = ",".join(str(k) for k in keys)
+        device_ids = list(dict.fromkeys(LANE_DEVICES.get(k, k) for k in keys))
+        conn = _Connection(name, device_ids, self._pipeline)
+        self._connections[name] = conn
+        for key in keys:
+            self._routes[key] = conn
+        return conn
 
-    def _get_client(self):
-        if self._client is None or not self._client.connected:
-            if self._client:
+    def _resolve(self, device_id, lane=None):
+        if lane is not None and self._default is None:
+            conn = self._routes.get(lane)
+            if conn is not None:
+                return conn
+        return self._route(device_id)
+
+    def _route(self, device_id):
+        if self._default is not None:
+            return self._default
+        conn = self._routes.get(device_id)
+        if conn is None:
+            with self._pool_lock:
+                conn = self._routes.get(device_id)
+                if conn is None:
+                    conn = self._add_connection([device_id])
+        return conn
+
+    def _get_client(self, conn):
+        if conn.client is None or not conn.client.connected:
+            if conn.client:
                 try:
-                    self._client.close()
+                    conn.client.close()
                 except Exception:
                     pass
-            self._client = ModbusTcpClient(
-                host=PLC_HOST,
-                port=PLC_PORT,
-                timeout=self._base_timeout,
-                retries=1,
-            )
-            if self._client.connect():
-                self._connect_time = time.time()
-                was_failed = self._fail_count > 0
-                self._fail_count = 0
+            if self._pipeline:
+                conn.client = PipelinedModbusClient(
+                    PLC_HOST,
+                    PLC_PORT,
+                    timeout=self._base_timeout,
+                    retries=1,
+                    max_inflight=MODBUS_MAX_INFLIGHT,
+                )
+            else:
+                conn.client = ModbusTcpClient(
+                    host=PLC_HOST,
+                    port=PLC_PORT,
+                    timeout=self._base_timeout,
+                    retries=1,
+                )
+            started = time.perf_counter()
+            connected = conn.client.connect()
+            CONNECT_SECONDS.observe(time.perf_counter() - started, conn.name, "ok" if connected else "error")
+            if connected:
+                conn.connect_time = time.time()
+                was_failed = conn.fail_count > 0
+                conn.fail_count = 0
+                conn.reconnects += 1
                 self._stats["reconnects"] += 1
-                if was_failed or self._stats["reconnects"] <= 1:
-                    logger.info("Modbus 連線成功")
+                if was_failed or conn.reconnects <= 1:
+                    logger.info(f"Modbus 連線成功 [{conn.name}]")
                 else:
-                    logger.debug("Modbus 重新連線成功")
+                    logger.debug(f"Modbus 重新連線成功 [{conn.name}]")
             else:
-                self._client = None
-                self._fail_count += 1
+                conn.client = None
+                conn.fail_count += 1
                 raise ConnectionError("無法連線至 PLC")
-        return self._client
+        return conn.client
 
-    def _backoff_delay(self):
-        if self._fail_count <= 0:
+    def _backoff_delay(self, conn):
+        if conn.fail_count <= 0:
             return 0
-        delay = min(0.5 * (2 ** (self._fail_count - 1)), self._max_backoff)
+        delay = min(0.5 * (2 ** (conn.fail_count - 1)), self._max_backoff)
         return delay
 
-    def execute(self, operation, *args, **kwargs):
-        with self._client_lock:
-            self._stats["total_requests"] += 1
-            last_error = None
+    def _attempt_client(self, conn):
+        if self._pipeline:
+            with conn.lock:
+                return self._get_client(conn)
+        return self._get_client(conn)
+
+    def _drop_client(self, conn, client):
+        if self._pipeline:
+            if client is None or client.connected:
+                return
+            with conn.lock:
+                if conn.client is not client:
+                    return
+                conn.client = None
+        else:
+            client, conn.client = conn.client, None
+        if client is not None:
+            try:
+                client.close()
+            except Exception:
+                pass
+
+    def _fast_fail(self, conn):
+        conn.fast_fails += 1
+        self._stats["fast_failed"] += 1
+        FAST_FAILS.inc(conn.name)
+        raise CircuitOpenError(f"PLC 連線中斷，暫停存取: {conn.open_error}")
+
+    def _trip(self, conn, error):
+        with self._breaker_lock:
+            if conn.breaker != BREAKER_CLOSED or self._closing:
+                return
+            now = time.time()
+            conn.breaker = BREAKER_OPEN
+            conn.opened_at = now
+            conn.open_error = error
+            conn.trips += 1
+            conn.probe_delay = MODBUS_BREAKER_PROBE_INTERVAL
+            conn.next_probe = now + conn.probe_delay
+            if self._prober is None:
+                self._prober = threading.Thread(target=self._probe_loop, name="modbus-prober", daemon=True)
+                self._prober.start()
+            else:
+                self._probe_wakeup.set()
+        logger.warning(f"斷路器開啟 [{conn.name}]: {error}，{conn.probe_delay:.1f} 秒後探測")
+
+    def _record_failure(self, conn, error):
+        conn.consecutive_failures += 1
+        if conn.consecutive_failures >= MODBUS_BREAKER_THRESHOLD:
+            self._trip(conn, error)
 
-            for attempt in range(self._max_retries):
-                if attempt > 0:
-                    delay = self._backoff_delay()
-                    if delay > 0:
-                        time.sleep(delay)
+    def _probe_loop(self):
+        while True:
+            with self._breaker_lock:
+                pending = [c for c in self._connections.values() if c.breaker != BREAKER_CLOSED]
+                if not pending or self._closing:
+                    self._prober = None
+                    return
+                self._probe_wakeup.clear()
+            now = time.time()
+            for conn in pending:
+                if conn.next_probe <= now:
+                    self._probe(conn)
+            with self._breaker_lock:
+                waits = [c.next_probe for c in self._connections.values() if c.breaker != BREAKER_CLOSED]
+            if waits:
+                self._probe_wakeup.wait(max(min(waits) - time.time(), 0.05))
 
+    def _probe_request(self, conn, client):
+        if not conn.device_ids:
+            return client.read_coils(address=0, count=1, device_id=PLC_A_SLAVE_ID)
+        return client.read_holding_registers(address=0, count=1, device_id=conn.device_ids[0])
+
+    def _probe(self, conn):
+        conn.breaker = BREAKER_HALF_OPEN
+        error = None
+        with conn.lock:
+            try:
+                client = self._get_client(conn)
+                result = self._probe_request(conn, client)
+                if isinstance(result, Exception):
+                    raise result
+                if hasattr(result, "isError") and result.isError() and not hasattr(result, "exception_code"):
+                    raise ConnectionError(str(result))
+            except Exception as e:
+                error = str(e) or "無法連線至 PLC"
+                if conn.client is not None:
+                    try:
+                        conn.client.close()
+                    except Exception:
+                        pass
+                    conn.client = None
+
+        with self._breaker_lock:
+            if error is None:
+                conn.breaker = BREAKER_CLOSED
+                conn.consecutive_failures = 0
+                conn.fail_count = 0
+                conn.probe_delay = MODBUS_BREAKER_PROBE_INTERVAL
+            else:
+                conn.breaker = BREAKER_OPEN
+                conn.probe_delay = min(conn.probe_delay * 2, MODBUS_BREAKER_MAX_PROBE_INTERVAL)
+                conn.next_probe = time.time() + conn.probe_delay
+        if error is None:
+            logger.info(f"斷路器關閉 [{conn.name}]: 探測成功，中斷 {time.time() - conn.opened_at:.1f} 秒")
+        else:
+            logger.debug(f"斷路器探測失敗 [{conn.name}]: {error}，{conn.probe_delay:.1f} 秒後重試")
+
+    def execute(self, operation, *args, device_id=None, function_code=None, priority=PRIORITY_READ, lane=None,
+                **kwargs):
+        conn = self._resolve(device_id, lane)
+        if conn.breaker != BREAKER_CLOSED:
+            self._fast_fail(conn)
+        labels = (device_id, function_code)
+        waited = conn.gate.acquire(priority)
+        try:
+            LOCK_WAIT_SECONDS.observe(waited, conn.name, PRIORITY_NAMES[priority])
+            return self._execute(conn, operation, args, kwargs, labels)
+        finally:
+            conn.gate.release()
+
+    def _execute(self, conn, operation, args, kwargs, labels=(None, None)):
+        self._stats["total_requests"] += 1
+        last_error = None
+
+        for attempt in range(self._max_retries):
+            if conn.breaker != BREAKER_CLOSED:
+                self._fast_fail(conn)
+            if attempt > 0:
+                delay = self._backoff_delay(conn)
+                if delay > 0:
+                    time.sleep(delay)
+
+            client = None
+            try:
+                client = self._attempt_client(conn)
+                started = time.perf_counter()
                 try:
-                    client = self._get_client()
                     result = operation(client, *args, **kwargs)
+                except Exception:
+                    REQUEST_SECONDS.observe(time.perf_counter() - started, *labels, "error")
+                    raise
+
+                if hasattr(result, 'isError') and result.isError():
+                    REQUEST_SECONDS.observe(time.perf_counter() - started, *labels, "exception")
+                    RETRIES.observe(attempt, conn.name)
+                    error_msg = parse_modbus_error(result)
+                    self._stats["failed"] += 1
+                    self._stats["last_error"] = error_msg
+                    conn.last_error = error_msg
+                    conn.consecutive_failures = 0
+                    return result
+
+                REQUEST_SECONDS.observe(time.perf_counter() - started, *labels, "ok")
+                RETRIES.observe(attempt, conn.name)
+                self._stats["successful"] += 1
+                self._stats["last_success"] = conn.last_success = time.time()
+                conn.fail_count = 0
+                conn.consecutive_failures = 0
+                return result
+
+            except CircuitOpenError:
+                raise
 
-                    if hasattr(result, 'isError') and result.isError():
-                        error_msg = parse_modbus_error(result)
-                        self._stats["failed"] += 1
-                        self._stats["last_error"] = error_msg
-                        return result
+            except ConnectionError:
+                last_error = "無法連線至 PLC"
+                self._drop_client(conn, client)
+                conn.fail_count += 1
+                if attempt == 0:
+                    logger.debug(f"連線失敗 [{conn.name}] (嘗試 {attempt + 1}/{self._max_retries})")
+                else:
+                    logger.warning(f"連線失敗 [{conn.name}] (嘗試 {attempt + 1}/{self._max_retries})")
+
+            except Exception as e:
+                last_error = str(e)
+                self._drop_client(conn, client)
+                conn.fail_count += 1
+                logger.warning(f"Modbus 錯誤 [{conn.name}] (嘗試 {attempt + 1}/{self._max_retries}): {e}")
+
+        RETRIES.observe(self._max_retries, conn.name)
+        self._stats["failed"] += 1
+        self._stats["last_error"] = conn.last_error = last_error
+        self._record_failure(conn, last_error)
+        raise ConnectionError(f"重試 {self._max_retries} 次後仍失敗: {last_error}")
+
+    def _execute_batch(self, conn, calls, priority):
+        if conn.breaker != BREAKER_CLOSED:
+            self._fast_fail(conn)
+        waited = conn.gate.acquire(priority)
+        try:
+            LOCK_WAIT_SECONDS.observe(waited, conn.name, PRIORITY_NAMES[priority])
+            return self._settle_batch(conn, calls)
+        finally:
+            conn.gate.release()
+
+    def _settle_batch(self, conn, calls):
+        self._stats["total_requests"] += len(calls)
+        results = [None] * len(calls)
+        pending = list(range(len(calls)))
+        last_error = None
+
+        for attempt in range(self._max_retries):
+            if conn.breaker != BREAKER_CLOSED:
+                self._fast_fail(conn)
+            if attempt > 0:
+                delay = self._backoff_delay(conn)
+                if delay > 0:
+                    time.sleep(delay)
 
+            client = None
+            try:
+                client = self._attempt_client(conn)
+                outcomes = client.execute_many([calls[i] for i in pending])
+            except CircuitOpenError:
+                raise
+            except Exception as e:
+                last_error = str(e) or "無法連線至 PLC"
+                self._drop_client(conn, client)
+                conn.fail_count += 1
+                logger.warning(f"Modbus 批次錯誤 [{conn.name}] (嘗試 {attempt + 1}/{self._max_retries}): {last_error}")
+                continue
+
+            retry = []
+            for i, (result, seconds) in zip(pending, outcomes):
+                fn, _, _, device_id = calls[i]
+                labels = (device_id, READ_FUNCTION_CODES[fn])
+                if isinstance(result, Exception):
+                    REQUEST_SECONDS.observe(seconds, *labels, "error")
+                    last_error = str(result) or type(result).__name__
+                    retry.append(i)
+                    continue
+                RETRIES.observe(attempt, conn.name)
+                results[i] = result
+                if result.isError():
+                    REQUEST_SECONDS.observe(seconds, *labels, "exception")
+                    self._stats["failed"] += 1
+                    self._stats["last_error"] = conn.last_error = parse_modbus_error(result)
+                else:
+                    REQUEST_SECONDS.observe(seconds, *labels, "ok")
                     self._stats["successful"] += 1
-                    self._stats["last_success"] = time.time()
-                    self._fail_count = 0
-                    return result
+                    self._stats["last_success"] = conn.last_success = time.time()
 
-                except ConnectionError:
-                    last_error = "無法連線至 PLC"
-                    self._client = None
-                    self._fail_count += 1
-                    if attempt == 0:
-                        logger.debug(f"連線失敗 (嘗試 {attempt + 1}/{self._max_retries})")
-                    else:
-                        logger.warning(f"連線失敗 (嘗試 {attempt + 1}/{self._max_retries})")
+            if not retry:
+                conn.fail_count = 0
+                conn.consecutive_failures = 0
+                return results
+            self._drop_client(conn, client)
+            conn.fail_count += 1
+            logger.warning(
+                f"Modbus 批次中 {len(retry)}/{len(pending)} 筆失敗 [{conn.name}] "
+                f"(嘗試 {attempt + 1}/{self._max_retries}): {last_error}"
+            )
+            pending = retry
+
+        for i in pending:
+            RETRIES.observe(self._max_retries, conn.name)
+            results[i] = ConnectionError(f"重試 {self._max_retries} 次後仍失敗: {last_error}")
+        self._stats["failed"] += len(pending)
+        self._stats["last_error"] = conn.last_error = last_error
+        self._record_failure(conn, last_error)
+        return results
 
+    def _join_flights(self, requests):
+        leaders = {}
+        followers = {}
+        with self._flights_lock:
+            now = time.time()
+            for i, req in enumerate(requests):
+                key = tuple(req[:4])
+                flight = self._flights.get(key)
+                if flight is not None and flight.done.is_set() and now - flight.finished > self._fresh_window:
+                    flight = None
+                if flight is None:
+                    flight = self._flights[key] = leaders[i] = _Flight()
+                else:
+                    self._stats["coalesced"] += 1
+                    followers[i] = flight
+        return leaders, followers
+
+    def _land_flights(self, requests, leaders, results):
+        for i, flight in leaders.items():
+            res = results[i]
+            if res is None:
+                res = ConnectionError("批次讀取中斷")
+            if isinstance(res, Exception):
+                flight.error = res
+            else:
+                flight.result = res
+            flight.finished = time.time()
+            if flight.error is not None or res.isError() or self._fresh_window <= 0:
+                key = tuple(requests[i][:4])
+                with self._flights_lock:
+                    if self._flights.get(key) is flight:
+                        del self._flights[key]
+            flight.done.set()
+
+    def read_many(self, requests, priority=PRIORITY_READ, coalesce=True):
+        requests = list(requests)
+        if self._pipeline:
+            results = [None] * len(requests)
+            if coalesce:
+                leaders, followers = self._join_flights(requests)
+                send = sorted(leaders)
+            else:
+                leaders, followers = {}, {}
+                send = list(range(len(requests)))
+
+            groups = {}
+            for i in send:
+                req = requests[i]
+                conn = self._resolve(req[3], req[4] if len(req) > 4 else None)
+                groups.setdefault(conn.name, (conn, []))[1].append(i)
+
+            def run_group(conn, calls):
+                try:
+                    return self._execute_batch(conn, [c[:4] for c in calls], priority)
                 except Exception as e:
-                    last_error = str(e)
-                    self._client = None
-                    self._fail_count += 1
-                    logger.warning(f"Modbus 錯誤 (嘗試 {attempt + 1}/{self._max_retries}): {e}")
+                    return [e] * len(calls)
 
-            self._stats["failed"] += 1
-            self._stats["last_error"] = last_error
-            raise ConnectionError(f"重試 {self._max_retries} 次後仍失敗: {last_error}")
+            futures = [
+                (indexes, self._batch_executor.submit(run_group, conn, [requests[i] for i in indexes]))
+                for conn, indexes in groups.values()
+            ]
+            try:
+                for indexes, future in futures:
+                    for i, res in zip(indexes, future.result()):
+                        results[i] = res
+            finally:
+                self._land_flights(requests, leaders, results)
+            for i, flight in followers.items():
+                flight.done.wait()
+                results[i] = flight.error if flight.error is not None else flight.result
+            return results
 
-    def read_coils(self, address, count, device_id):
+        results = []
+        for fn, address, count, device_id, *lane in requests:
+            try:
+                results.append(getattr(self, fn)(
+                    address, count, device_id, priority=priority, coalesce=coalesce, lane=lane[0] if lane else None,
+                ))
+            except Exception as e:
+                results.append(e)
+        return results
+
+    def _single_flight(self, key, function_code, priority, operation, *args, coalesce=True, lane=None):
+        if not coalesce:
+            return self.execute(
+                operation, *args, device_id=key[-1], function_code=function_code, priority=priority, lane=lane,
+            )
+        with self._flights_lock:
+            flight = self._flights.get(key)
+            if flight is not None and flight.done.is_set() and time.time() - flight.finished > self._fresh_window:
+                flight = None
+            leader = flight is None
+            if leader:
+                flight = _Flight()
+                self._flights[key] = flight
+            else:
+                self._stats["coalesced"] += 1
+
+        if not leader:
+            flight.done.wait()
+            if flight.error is not None:
+                raise flight.error
+            return flight.result
+
+        try:
+            flight.result = self.execute(
+                operation, *args, device_id=key[-1], function_code=function_code, priority=priority, lane=lane,
+            )
+        except Exception as e:
+            flight.error = e
+            raise
+        finally:
+            flight.finished = time.time()
+            failed = flight.error is not None or (
+                hasattr(flight.result, 'isError') and flight.result.isError()
+            )
+            if failed or self._fresh_window <= 0:
+                with self._flights_lock:
+                    if self._flights.get(key) is flight:
+                        del self._flights[key]
+            flight.done.set()
+        return flight.result
+
+    def read_coils(self, address, count, device_id, priority=PRIORITY_READ, coalesce=True, lane=None):
         def op(client, addr, cnt, dev):
             return client.read_coils(address=addr, count=cnt, device_id=dev)
-        return self.execute(op, address, count, device_id)
+        return self._single_flight(
+            ("read_coils", address, count, device_id), 1, priority, op, address, count, device_id,
+            coalesce=coalesce, lane=lane,
+        )
 
-    def write_coil(self, address, value, device_id):
+    def _invalidate(self, device_id):
+        with self._flights_lock:
+            for key in [k for k in self._flights if k[-1] == device_id]:
+                del self._flights[key]
+
+    def write_coil(self, address, value, device_id, priority=PRIORITY_WRITE):
         def op(client, addr, val, dev):
             return client.write_coil(address=addr, value=val, device_id=dev)
-        return self.execute(op, address, value, device_id)
+        try:
+            return self.execute(op, address, value, device_id, device_id=device_id, function_code=5, priority=priority)
+        finally:
+            self._invalidate(device_id)
+
+    def write_coils(self, address, values, device_id, priority=PRIORITY_WRITE):
+        def op(client, addr, vals, dev):
+            return client.write_coils(address=addr, values=vals, device_id=dev)
+        try:
+            return self.execute(
+                op, address, [bool(v) for v in values], device_id,
+                device_id=device_id, function_code=15, priority=priority,
+            )
+        finally:
+            self._invalidate(device_id)
 
-    def read_holding_registers(self, address, count, device_id):
+    def read_holding_registers(self, address, count, device_id, priority=PRIORITY_READ, coalesce=True, lane=None):
         def op(client, addr, cnt, dev):
             return client.read_holding_registers(address=addr, count=cnt, device_id=dev)
-        return self.execute(op, address, count, device_id)
+        return self._single_flight(
+            ("read_holding_registers", address, count, device_id), 3, priority, op, address, count, device_id,
+            coalesce=coalesce, lane=lane,
+        )
 
-    def read_input_registers(self, address, count, device_id):
+    def read_input_registers(self, address, count, device_id, priority=PRIORITY_READ, coalesce=True, lane=None):
         def op(client, addr, cnt, dev):
             return client.read_input_registers(address=addr, count=cnt, device_id=dev)
-        return self.execute(op, address, count, device_id)
+        return self._single_flight(
+            ("read_input_registers", address, count, device_id), 4, priority, op, address, count, device_id,
+            coalesce=coalesce, lane=lane,
+        )
 
     def check_connection(self):
-        try:
-            with self._client_lock:
-                client = self._get_client()
-                return client.connected
-        except Exception:
-            return False
+        return any(conn.is_connected() for conn in list(self._connections.values()))
 
     def get_stats(self):
+        connections = {name: conn.get_stats() for name, conn in list(self._connections.items())}
         return {
             **self._stats,
-            "connected": self._client is not None and self._client.connected,
-            "fail_count": self._fail_count,
-            "uptime": time.time() - self._connect_time if self._connect_time > 0 else 0,
+            "connected": any(c["connected"] for c in connections.values()),
+            "breaker_open": [name for name, c in connections.items() if c["breaker"]["state"] != BREAKER_CLOSED],
+            "fail_count": max((c["fail_count"] for c in connections.values()), default=0),
+            "uptime": max((c["uptime"] for c in connections.values()), default=0),
+            "connections": connections,
         }
 
     def close(self):
-        with self._client_lock:
-            if self._client:
-                try:
-                    self._client.close()
-                except Exception:
-                    pass
-                self._client = None
+        with self._breaker_lock:
+            self._closing = True
+            self._probe_wakeup.set()
+        for conn in list(self._connections.values()):
+            with conn.lock:
+                if conn.client:
+                    try:
+                        conn.client.close()
+                    except Exception:
+                        pass
+                    conn.client = None
+        if self._batch_executor is not None:
+            self._batch_executor.shutdown(wait=False)
 
 
 modbus = ModbusManager()
+registry.callback(
+    "modbus_requests_total", "Modbus execute 呼叫次數", ("outcome",),
+    lambda: {(key,): modbus._stats[key] for key in ("successful", "failed", "coalesced")},
+    kind="counter",
+)
+registry.callback(
+    "modbus_connection_up", "連線池各連線是否已連線", ("connection",),
+    lambda: {(name,): int(conn.is_connected()) for name, conn in list(modbus._connections.items())},
+)
+registry.callback(
+    "modbus_queue_depth", "依優先等級排隊中的 Modbus 請求數", ("connection", "priority"),
+    lambda: {
+        (name, priority): depth
+        for name, conn in list(modbus._connections.items())
+        for priority, depth in conn.gate.depth().items()
+    },
+)
+registry.callback(
+    "modbus_breaker_open", "斷路器狀態 (0 關閉、1 開啟、0.5 半開探測中)", ("connection",),
+    lambda: {
+        (name,): {BREAKER_CLOSED: 0, BREAKER_OPEN: 1, BREAKER_HALF_OPEN: 0.5}[conn.breaker]
+        for name, conn in list(modbus._connections.items())
+    },
+)
@@ -0,0 +1,259 @@
+import asyncio
+import struct
+import threading
+import time
+import logging
+
+logger = logging.getLogger(__name__)
+
+FC_READ_COILS = 0x01
+FC_READ_HOLDING_REGISTERS = 0x03
+FC_READ_INPUT_REGISTERS = 0x04
+FC_WRITE_SINGLE_COIL = 0x05
+FC_WRITE_MULTIPLE_COILS = 0x0F
+
+_loop = None
+_loop_lock = threading.Lock()
+
+
+def _get_loop():
+    global _loop
+    with _loop_lock:
+        if _loop is None:
+            _loop = asyncio.new_event_loop()
+            thread = threading.Thread(target=_loop.run_forever, name="modbus-pipeline", daemon=True)
+            thread.start()
+        return _loop
+
+
+class PipelineResponse:
+    def __init__(self, function_code, device_id, registers=None, bits=None):
+        self.function_code = function_code
+        self.device_id = device_id
+        self.registers = registers or []
+        self.bits = bits or []
+
+    def isError(self):
+        return False
+
+
+class PipelineExceptionResponse:
+    def __init__(self, function_code, device_id, exception_code):
+        self.function_code = function_code
+        self.device_id = device_id
+        self.exception_code = exception_code
+
+    def isError(self):
+        return True
+
+    def __str__(self):
+        return f"ExceptionResponse(fc={self.function_code}, code={self.exception_code})"
+
+
+def decode_pdu(device_id, pdu):
+    fc = pdu[0]
+    if fc & 0x80:
+        return PipelineExceptionResponse(fc, device_id, pdu[1])
+    if fc == FC_READ_COILS:
+        byte_count = pdu[1]
+        bits = []
+        for byte in pdu[2:2 + byte_count]:
+            for i in range(8):
+                bits.append(bool(byte >> i & 1))
+        return PipelineResponse(fc, device_id, bits=bits)
+    if fc in (FC_READ_HOLDING_REGISTERS, FC_READ_INPUT_REGISTERS):
+        byte_count = pdu[1]
+        registers = list(struct.unpack(f">{byte_count // 2}H", pdu[2:2 + byte_count]))
+        return PipelineResponse(fc, device_id, registers=registers)
+    if fc == FC_WRITE_SINGLE_COIL:
+        _, value = struct.unpack(">HH", pdu[1:5])
+        return PipelineResponse(fc, device_id, bits=[value == 0xFF00])
+    if fc == FC_WRITE_MULTIPLE_COILS:
+        address, count = struct.unpack(">HH", pdu[1:5])
+        response = PipelineResponse(fc, device_id)
+        response.address = address
+        response.count = count
+        return response
+    raise ValueError(f"不支援的功能碼回應: {fc}")
+
+
+class AsyncModbusEngine:
+    def __init__(self, host, port, timeout=3, retries=1, max_inflight=8):
+        self.host = host
+        self.port = port
+        self.timeout = timeout
+        self.retries = retries
+        self.max_inflight = max_inflight
+        self.connected = False
+        self._reader = None
+        self._writer = None
+        self._read_task = None
+        self._connect_lock = None
+        self._inflight = None
+        self._pending = {}
+        self._next_tid = 0
+
+    async def connect(self):
+        if self._connect_lock is None:
+            self._connect_lock = asyncio.Lock()
+            self._inflight = asyncio.Semaphore(self.max_inflight)
+        async with self._connect_lock:
+            if self.connected:
+                return
+            self._close_writer()
+            reader, writer = await asyncio.wait_for(
+                asyncio.open_connection(self.host, self.port), self.timeout
+            )
+            self._reader = reader
+            self._writer = writer
+            self.connected = True
+            self._read_task = asyncio.get_running_loop().create_task(self._read_loop(reader))
+
+    async def close(self):
+        self.connected = False
+        if self._read_task is not None:
+            self._read_task.cancel()
+            self._read_task = None
+        self._close_writer()
+        self._fail_pending(ConnectionError("PLC 連線已關閉"))
+
+    def _close_writer(self):
+        if self._writer is not None:
+            try:
+                self._writer.close()
+            except Exception:
+                pass
+            self._writer = None
+
+    async def _read_loop(self, reader):
+        try:
+            while True:
+                header = await reader.readexactly(7)
+                tid, _, length, device_id = struct.unpack(">HHHB", header)
+                pdu = await reader.readexactly(length - 1)
+                future = self._pending.pop(tid, None)
+                if future is None or future.done():
+                    logger.debug(f"捨棄逾時交易回應 (TID {tid})")
+                    continue
+                try:
+                    future.set_result(decode_pdu(device_id, pdu))
+                except Exception as e:
+                    future.set_exception(e)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.debug(f"Modbus 管線讀取中斷: {e}")
+        finally:
+            if self._reader is reader:
+                self.connected = False
+                self._close_writer()
+                self._fail_pending(ConnectionError("PLC 連線中斷"))
+
+    def _fail_pending(self, error):
+        pending, self._pending = self._pending, {}
+        for future in pending.values():
+            if not future.done():
+                future.set_exception(error)
+
+    def _allocate_tid(self):
+        for _ in range(0x10000):
+            self._next_tid = (self._next_tid + 1) & 0xFFFF
+            if self._next_tid and self._next_tid not in self._pending:
+                return self._next_tid
+        raise RuntimeError("交易 ID 已用盡")
+
+    async def request(self, device_id, pdu):
+        last_error = None
+        for attempt in range(self.retries + 1):
+            await self.connect()
+            async with self._inflight:
+                tid = self._allocate_tid()
+                future = asyncio.get_running_loop().create_future()
+                self._pending[tid] = future
+                frame = struct.pack(">HHHB", tid, 0, len(pdu) + 1, device_id) + pdu
+                try:
+                    self._writer.write(frame)
+                    await self._writer.drain()
+                    return await asyncio.wait_for(future, self.timeout)
+                except asyncio.TimeoutError:
+                    last_error = TimeoutError(f"Modbus 交易逾時 (TID {tid}, Slave {device_id})")
+                    logger.debug(f"{last_error} (嘗試 {attempt + 1}/{self.retries + 1})")
+                finally:
+                    self._pending.pop(tid, None)
+        raise last_error
+
+    async def read_coils(self, address, count, device_id):
+        pdu = struct.pack(">BHH", FC_READ_COILS, address, count)
+        return await self.request(device_id, pdu)
+
+    async def read_holding_registers(self, address, count, device_id):
+        pdu = struct.pack(">BHH", FC_READ_HOLDING_REGISTERS, address, count)
+        return await self.request(device_id, pdu)
+
+    async def read_input_registers(self, address, count, device_id):
+        pdu = struct.pack(">BHH", FC_READ_INPUT_REGISTERS, address, count)
+        return await self.request(device_id, pdu)
+
+    async def write_coil(self, address, value, device_id):
+        pdu = struct.pack(">BHH", FC_WRITE_SINGLE_COIL, address, 0xFF00 if value else 0)
+        return await self.request(device_id, pdu)
+
+    async def write_coils(self, address, values, device_id):
+        packed = bytearray((len(values) + 7) // 8)
+        for i, value in enumerate(values):
+            if value:
+                packed[i // 8] |= 1 << (i % 8)
+        pdu = struct.pack(">BHHB", FC_WRITE_MULTIPLE_COILS, address, len(values), len(packed)) + bytes(packed)
+        return await self.request(device_id, pdu)
+
+    async def _timed(self, fn, args):
+        started = time.perf_counter()
+        try:
+            result = await getattr(self, fn)(*args)
+        except Exception as e:
+            result = e
+        return result, time.perf_counter() - started
+
+    async def execute_many(self, calls):
+        return await asyncio.gather(*(self._timed(fn, args) for fn, *args in calls))
+
+
+class PipelinedModbusClient:
+    def __init__(self, host, port, timeout=3, retries=1, max_inflight=8):
+        self._engine = AsyncModbusEngine(host, port, timeout, retries, max_inflight)
+
+    def _call(self, coro):
+        return asyncio.run_coroutine_threadsafe(coro, _get_loop()).result()
+
+    @property
+    def connected(self):
+        return self._engine.connected
+
+    def connect(self):
+        try:
+            self._call(self._engine.connect())
+            return True
+        except Exception as e:
+            logger.debug(f"Modbus 管線連線失敗: {e}")
+            return False
+
+    def close(self):
+        self._call(self._engine.close())
+
+    def read_coils(self, address, count=1, device_id=1):
+        return self._call(self._engine.read_coils(address, count, device_id))
+
+    def read_holding_registers(self, address, count=1, device_id=1):
+        return self._call(self._engine.read_holding_registers(address, count, device_id))
+
+    def read_input_registers(self, address, count=1, device_id=1):
+        return self._call(self._engine.read_input_registers(address, count, device_id))
+
+    def write_coil(self, address, value, device_id=1):
+        return self._call(self._engine.write_coil(address, value, device_id))
+
+    def write_coils(self, address, values, device_id=1):
+        return self._call(self._engine.write_coils(address, values, device_id))
+
+    def execute_many(self, calls):
+        return self._call(self._engine.execute_many(calls))
@@ -0,0 +1,334 @@
+import os
+import threading
+import time
+import logging
+from modbus_manager import modbus, PRIORITY_POLL, PRIORITY_READ
+from metrics import registry
+from read_planner import plan_reads, block_request, route_values, describe_plan
+from config import POLL_INTERVAL, READBACK_DELAY
+
+logger = logging.getLogger(__name__)
+
+POLL_SECONDS = registry.histogram("plc_poll_seconds", "每輪輪詢耗時")
+READBACK_SECONDS = registry.histogram("plc_readback_seconds", "寫入後由樂觀更新到讀回確認的時間")
+JITTER_SECONDS = registry.histogram("plc_poll_jitter_seconds", "輪詢實際開始時間與排定時間的差", ("group",))
+OVERRUNS = registry.counter("plc_poll_overruns_total", "輪詢超過期限才完成的次數", ("group",))
+SKIPPED = registry.counter("plc_poll_skipped_total", "逾期而被合併略過的輪詢週期數", ("group",))
+
+
+def snapshot_entry(snap, name):
+    if name not in snap["updated"]:
+        return None, "資料尚未就緒", None, 0
+    return (
+        snap["values"].get(name),
+        snap["errors"].get(name),
+        snap["updated"][name],
+        snap["versions"].get(name, 0),
+    )
+
+
+class PlcPoller:
+    def __init__(self, interval=POLL_INTERVAL, readback_delay=READBACK_DELAY):
+        self._lock = threading.Lock()
+        self._changed = threading.Condition(self._lock)
+        self._poll_lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+        self._readback_thread = None
+        self._readback_wakeup = threading.Event()
+        self._readback = set()
+        self.interval = interval
+        self.readback_delay = readback_delay
+        self._tasks = {}
+        self._confirms = {}
+        self._schedule = {}
+        self._plan = None
+        self._task_plans = {}
+        self._pending = {}
+        self._write_seq = 0
+        self._snapshot = {
+            "epoch": f"{os.getpid():x}-{int(time.time()):x}",
+            "version": 0,
+            "timestamp": None,
+            "values": {},
+            "errors": {},
+            "updated": {},
+            "versions": {},
+            "pending": {},
+        }
+        self._stats = {
+            "polls": 0,
+            "last_poll": None,
+            "last_duration": 0,
+            "optimistic": 0,
+            "readbacks": 0,
+            "readback_retries": 0,
+            "confirmed": 0,
+            "rolled_back": 0,
+        }
+
+    def register(self, name, points, decode, interval=None, deadline=None, confirm=None):
+        self._tasks[name] = ([dict(p, id=(name, p["key"])) for p in points], decode)
+        if confirm is not None:
+            self._confirms[name] = confirm
+        interval = interval or self.interval
+        self._schedule[name] = {
+            "interval": interval,
+            "deadline": min(deadline or interval, interval),
+            "release": None,
+            "polls": 0,
+            "skipped": 0,
+            "overruns": 0,
+            "last_jitter": 0,
+            "max_jitter": 0,
+            "jitter_total": 0,
+        }
+        self._plan = None
+        self._task_plans = {}
+
+    def get_plan(self):
+        if self._plan is None:
+            self._plan = plan_reads([p for points, _ in self._tasks.values() for p in points])
+        return self._plan
+
+    def start(self):
+        if self._thread is not None and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="plc-poller", daemon=True)
+        self._thread.start()
+        self._readback_thread = threading.Thread(target=self._run_readback, name="plc-readback", daemon=True)
+        self._readback_thread.start()
+        rates = ", ".join(f"{name} {s['interval']}s" for name, s in self._schedule.items())
+        logger.info(f"PLC 輪詢器啟動: {len(self._tasks)} 項 ({rates})")
+
+    def stop(self):
+        self._stop.set()
+        self._readback_wakeup.set()
+
+    def _run(self):
+        while not self._stop.is_set():
+            now = time.time()
+            due = self._due(now)
+            if due:
+                self._poll_due(due, now)
+            else:
+                self._stop.wait(min(s["release"] for s in self._schedule.values()) - now)
+
+    def _due(self, now):
+        for s in self._schedule.values():
+            if s["release"] is None:
+                s["release"] = now
+        due = [name for name, s in self._schedule.items() if s["release"] <= now]
+        return sorted(due, key=lambda name: self._schedule[name]["release"] + self._schedule[name]["deadline"])
+
+    def _poll_due(self, names, started):
+        batches = {}
+        for name in names:
+            batches.setdefault(self._schedule[name]["deadline"], []).append(name)
+        for batch in batches.values():
+            self._poll_batch(batch)
+        finished = time.time()
+        self._stats["polls"] += 1
+        self._stats["last_poll"] = finished
+        self._stats["last_duration"] = round(finished - started, 3)
+        POLL_SECONDS.observe(finished - started)
+
+    def _poll_batch(self, names):
+        started = time.time()
+        self._poll_tasks(names, self._get_task_plan(names), PRIORITY_POLL)
+        finished = time.time()
+        for name in names:
+            s = self._schedule[name]
+            jitter = started - s["release"]
+            s["polls"] += 1
+            s["last_jitter"] = jitter
+            s["max_jitter"] = max(s["max_jitter"], jitter)
+            s["jitter_total"] += jitter
+            JITTER_SECONDS.observe(jitter, name)
+            if finished > s["release"] + s["deadline"]:
+                s["overruns"] += 1
+                OVERRUNS.inc(name)
+            cycles = int((finished - s["release"]) // s["interval"]) + 1
+            if cycles > 1:
+                s["skipped"] += cycles - 1
+                SKIPPED.inc(name, amount=cycles - 1)
+            s["release"] += cycles * s["interval"]
+
+    def _run_readback(self):
+        retry = set()
+        retry_at = None
+        while not self._stop.is_set():
+            self._readback_wakeup.wait(None if retry_at is None else max(retry_at - time.time(), 0))
+            if self._stop.wait(self.readback_delay):
+                return
+            with self._lock:
+                self._readback_wakeup.clear()
+                names = self._readback
+                self._readback = set()
+            if retry_at is not None and time.time() >= retry_at:
+                names |= retry
+                retry = set()
+                retry_at = None
+            if names:
+                self._stats["readbacks"] += 1
+                failed = self._read_back(sorted(names))
+                if failed:
+                    self._stats["readback_retries"] += 1
+                    retry.update(failed)
+                    retry_at = time.time() + min(self._schedule[name]["interval"] for name in retry)
+
+    def _read_back(self, names):
+        blocks = self._get_task_plan(names)
+        failed = []
+        with self._poll_lock:
+            seq = self._write_seq
+            responses = modbus.read_many([block_request(b) for b in blocks], priority=PRIORITY_READ, coalesce=False)
+            values, errors = route_values(blocks, responses)
+            for name in names:
+                points = self._tasks[name][0]
+                error = next((errors[p["id"]] for p in points if p["id"] in errors), None)
+                if error is not None:
+                    logger.debug(f"讀回 {name} 失敗，保留待確認狀態: {error}")
+                    failed.append(name)
+                    continue
+                value = self._confirms[name]({p["key"]: values[p["id"]] for p in points})
+                self._publish(name, value, None, seq)
+        return failed
+
+    def _get_task_plan(self, names):
+        key = tuple(names)
+        plan = self._task_plans.get(key)
+        if plan is None:
+            plan = self._task_plans[key] = plan_reads([p for n in key for p in self._tasks[n][0]])
+        return plan
+
+    def _poll_tasks(self, names, blocks, priority, coalesce=True):
+        with self._poll_lock:
+            seq = self._write_seq
+            responses = modbus.read_many([block_request(b) for b in blocks], priority=priority, coalesce=coalesce)
+            values, errors = route_values(blocks, responses)
+            for name in names:
+                points, decode = self._tasks[name]
+                try:
+                    for p in points:
+                        if p["id"] in errors:
+                            raise errors[p["id"]]
+                    value = decode({p["key"]: values[p["id"]] for p in points})
+                    self._publish(name, value, None, seq)
+                except Exception as e:
+                    if self._snapshot["errors"].get(name) != str(e):
+                        logger.warning(f"輪詢 {name} 失敗: {e}")
+                    self._publish(name, None, str(e))
+
+    def apply_optimistic(self, name, updates):
+        now = time.time()
+        with self._lock:
+            snap = self._snapshot
+            current = snap["values"].get(name)
+            if current is None or not updates or name not in self._confirms:
+                return None
+            self._write_seq += 1
+            pending = self._pending.setdefault(name, {})
+            for key, value in updates.items():
+                pending[key] = (value, self._write_seq, now)
+            self._stats["optimistic"] += 1
+            self._replace(snap, name, {**current, **updates}, snap["errors"].get(name), snap["updated"])
+            self._readback.add(name)
+            self._readback_wakeup.set()
+            return self._snapshot["version"]
+
+    def _reconcile(self, name, value, seq, now):
+        pending = self._pending.get(name)
+        if not pending:
+            return value
+        value = dict(value)
+        for key, (expected, write_seq, applied) in list(pending.items()):
+            if write_seq > seq:
+                value[key] = expected
+                continue
+            del pending[key]
+            READBACK_SECONDS.observe(now - applied)
+            if value.get(key) == expected:
+                self._stats["confirmed"] += 1
+            else:
+                self._stats["rolled_back"] += 1
+                logger.warning(f"寫入讀回不符 {name}[{key}]: 預期 {expected}，實際 {value.get(key)}")
+        if not pending:
+            del self._pending[name]
+        return value
+
+    def _replace(self, snap, name, value, error, updated):
+        values = dict(snap["values"])
+        values[name] = value
+        errors = dict(snap["errors"])
+        errors[name] = error
+        version = snap["version"] + 1
+        versions = dict(snap["versions"])
+        versions[name] = version
+        self._snapshot = {
+            "epoch": snap["epoch"],
+            "version": version,
+            "timestamp": time.time(),
+            "values": values,
+            "errors": errors,
+            "updated": updated,
+            "versions": versions,
+            "pending": {n: {k: v[0] for k, v in p.items()} for n, p in self._pending.items()},
+        }
+        self._changed.notify_all()
+
+    def _publish(self, name, value, error, seq=None):
+        now = time.time()
+        with self._lock:
+            snap = self._snapshot
+            pending_before = name in self._pending
+            if value is not None and seq is not None:
+                value = self._reconcile(name, value, seq, now)
+            changed = (
+                name not in snap["values"]
+                or snap["values"][name] != value
+                or snap["errors"].get(name) != error
+                or pending_before != (name in self._pending)
+            )
+            updated = dict(snap["updated"])
+            updated[name] = now
+            if changed:
+                self._replace(snap, name, value, error, updated)
+            else:
+                self._snapshot = {**snap, "timestamp": now, "updated": updated}
+
+    def get_snapshot(self):
+        return self._snapshot
+
+    def wait_for_change(self, version, timeout=None):
+        with self._changed:
+            self._changed.wait_for(lambda: self._snapshot["version"] != version, timeout)
+            return self._snapshot
+
+    def get(self, name):
+        return snapshot_entry(self._snapshot, name)
+
+    def get_stats(self):
+        return {
+            **self._stats,
+            "version": self._snapshot["version"],
+            "tasks": list(self._tasks.keys()),
+            "schedule": {
+                name: {
+                    "interval": s["interval"],
+                    "deadline": s["deadline"],
+                    "polls": s["polls"],
+                    "skipped": s["skipped"],
+                    "overruns": s["overruns"],
+                    "last_jitter": round(s["last_jitter"], 4),
+                    "max_jitter": round(s["max_jitter"], 4),
+                    "avg_jitter": round(s["jitter_total"] / s["polls"], 4) if s["polls"] else 0,
+                }
+                for name, s in self._schedule.items()
+            },
+            "plan": describe_plan(self.get_plan()),
+        }
+
+
+poller = PlcPoller()
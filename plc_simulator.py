@@ -0,0 +1,257 @@
+import math
+import time
+import random
+import struct
+import asyncio
+import argparse
+import logging
+import numpy as np
+from config import (
+    METER1_SLAVE_ID, METER2_SLAVE_ID,
+    PLC_A_SLAVE_ID, PLC_B_SLAVE_ID, PLC_TEMP_SLAVE_ID,
+    METER1_BASE_R, METER2_BASE_R, METER1_PARAMS, METER2_PARAMS, METER_WORD_SWAP,
+    TEMP_R_REG, TEMP_COUNT,
+    BOX_A_COIL_COUNT, BOX_B_COIL_COUNT,
+    fatek_r_addr, fatek_y_addr,
+)
+
+logger = logging.getLogger(__name__)
+
+REGISTER_SPACE = 10000
+COIL_SPACE = 256
+UNWIRED_CHANNELS = (4, 5, 6, 7)
+RTD_OPEN = 0x7FFF
+
+EXC_ILLEGAL_FUNCTION = 1
+EXC_ILLEGAL_ADDRESS = 2
+EXC_ILLEGAL_VALUE = 3
+EXC_DEVICE_FAILURE = 4
+
+
+class SimulatorException(Exception):
+    def __init__(self, code):
+        super().__init__(code)
+        self.code = code
+
+
+class SimulatedPlc:
+    def __init__(self, seed=None):
+        self.registers = np.zeros(REGISTER_SPACE, dtype=np.uint16)
+        self.coils = {
+            PLC_A_SLAVE_ID: np.zeros(COIL_SPACE, dtype=bool),
+            PLC_B_SLAVE_ID: np.zeros(COIL_SPACE, dtype=bool),
+        }
+        self.coil_counts = {PLC_A_SLAVE_ID: BOX_A_COIL_COUNT, PLC_B_SLAVE_ID: BOX_B_COIL_COUNT}
+        self.units = {METER1_SLAVE_ID, METER2_SLAVE_ID, PLC_A_SLAVE_ID, PLC_B_SLAVE_ID, PLC_TEMP_SLAVE_ID}
+        self._rng = random.Random(seed)
+        self._started = time.time()
+        self.tick()
+
+    def _write_float(self, r_num, value):
+        hi, lo = struct.unpack(">HH", struct.pack(">f", value))
+        address = fatek_r_addr(r_num)
+        self.registers[address:address + 2] = (lo, hi) if METER_WORD_SWAP else (hi, lo)
+
+    def _meter_value(self, param, phase):
+        unit = param["unit"]
+        wave = math.sin((time.time() - self._started) / 30 + phase)
+        if unit == "V":
+            value = 220 + 2 * wave
+        elif unit == "A":
+            value = 30 + 5 * wave + self._rng.uniform(-0.5, 0.5)
+        elif unit == "kW":
+            value = 6 + wave
+        else:
+            value = 0.94 + 0.03 * wave
+        return value * param.get("div", 1)
+
+    def tick(self):
+        elapsed = time.time() - self._started
+        for i in range(TEMP_COUNT):
+            if i in UNWIRED_CHANNELS:
+                raw = RTD_OPEN
+            else:
+                temp = 24 + 0.3 * i + 0.5 * math.sin(elapsed / 60 + i) + self._rng.uniform(-0.05, 0.05)
+                raw = int(round(temp * 10)) & 0xFFFF
+            self.registers[fatek_r_addr(TEMP_R_REG + i)] = raw
+        for base_r, params in ((METER1_BASE_R, METER1_PARAMS), (METER2_BASE_R, METER2_PARAMS)):
+            for p in params:
+                self._write_float(base_r + p["offset"], self._meter_value(p, p["offset"] / 10))
+
+    def handle(self, unit, pdu):
+        fc = pdu[0]
+        try:
+            if fc == 0x01:
+                address, count = struct.unpack(">HH", pdu[1:5])
+                bits = self._coil_bank(unit, address, count)[address:address + count]
+                packed = np.packbits(bits.astype(np.uint8), bitorder="little").tobytes()
+                return struct.pack(">BB", fc, len(packed)) + packed
+            if fc in (0x03, 0x04):
+                address, count = struct.unpack(">HH", pdu[1:5])
+                if count < 1 or count > 125 or address + count > REGISTER_SPACE:
+                    raise SimulatorException(EXC_ILLEGAL_ADDRESS)
+                words = self.registers[address:address + count].astype(">u2").tobytes()
+                return struct.pack(">BB", fc, len(words)) + words
+            if fc == 0x05:
+                address, value = struct.unpack(">HH", pdu[1:5])
+                if value not in (0x0000, 0xFF00):
+                    raise SimulatorException(EXC_ILLEGAL_VALUE)
+                self._coil_bank(unit, address, 1)[address] = value == 0xFF00
+                return pdu[:5]
+            if fc == 0x06:
+                address, value = struct.unpack(">HH", pdu[1:5])
+                if address >= REGISTER_SPACE:
+                    raise SimulatorException(EXC_ILLEGAL_ADDRESS)
+                self.registers[address] = value
+                return pdu[:5]
+            if fc == 0x0F:
+                address, count, byte_count = struct.unpack(">HHB", pdu[1:6])
+                bank = self._coil_bank(unit, address, count)
+                bits = np.unpackbits(np.frombuffer(pdu[6:6 + byte_count], dtype=np.uint8), bitorder="little")
+                if len(bits) < count:
+                    raise SimulatorException(EXC_ILLEGAL_VALUE)
+                bank[address:address + count] = bits[:count].astype(bool)
+                return pdu[:5]
+            if fc == 0x10:
+                address, count, byte_count = struct.unpack(">HHB", pdu[1:6])
+                if address + count > REGISTER_SPACE or byte_count != count * 2:
+                    raise SimulatorException(EXC_ILLEGAL_ADDRESS)
+                self.registers[address:address + count] = np.frombuffer(pdu[6:6 + byte_count], dtype=">u2")
+                return pdu[:5]
+            raise SimulatorException(EXC_ILLEGAL_FUNCTION)
+        except SimulatorException as e:
+            return struct.pack(">BB", fc | 0x80, e.code)
+        except struct.error:
+            return struct.pack(">BB", fc | 0x80, EXC_ILLEGAL_VALUE)
+
+    def _coil_bank(self, unit, address, count):
+        bank = self.coils.get(unit)
+        if bank is None:
+            raise SimulatorException(EXC_ILLEGAL_ADDRESS)
+        limit = fatek_y_addr(self.coil_counts[unit])
+        if count < 1 or count > 2000 or address + count > limit:
+            raise SimulatorException(EXC_ILLEGAL_ADDRESS)
+        return bank
+
+
+class FaultProfile:
+    def __init__(self, latency=0.0, jitter=0.0, drop_rate=0.0, exception_rate=0.0,
+                 disconnect_rate=0.0, concurrent=False, seed=None):
+        self.latency = latency
+        self.jitter = jitter
+        self.drop_rate = drop_rate
+        self.exception_rate = exception_rate
+        self.disconnect_rate = disconnect_rate
+        self.concurrent = concurrent
+        self._rng = random.Random(seed)
+
+    def delay(self):
+        return max(self.latency + self._rng.uniform(-self.jitter, self.jitter), 0.0)
+
+    def roll(self, rate):
+        return rate > 0 and self._rng.random() < rate
+
+
+class SimulatorServer:
+    def __init__(self, plc, faults, host="127.0.0.1", port=5020, tick_interval=1.0):
+        self.plc = plc
+        self.faults = faults
+        self.host = host
+        self.port = port
+        self.tick_interval = tick_interval
+        self.stats = {"connections": 0, "requests": 0, "dropped": 0, "exceptions": 0, "disconnects": 0}
+
+    async def _respond(self, writer, tid, unit, pdu):
+        delay = self.faults.delay()
+        if delay:
+            await asyncio.sleep(delay)
+        self.stats["requests"] += 1
+        if self.faults.roll(self.faults.disconnect_rate):
+            self.stats["disconnects"] += 1
+            writer.close()
+            return
+        if self.faults.roll(self.faults.drop_rate):
+            self.stats["dropped"] += 1
+            return
+        if self.faults.roll(self.faults.exception_rate):
+            self.stats["exceptions"] += 1
+            response = struct.pack(">BB", pdu[0] | 0x80, EXC_DEVICE_FAILURE)
+        else:
+            response = self.plc.handle(unit, pdu)
+        if not writer.is_closing():
+            writer.write(struct.pack(">HHHB", tid, 0, len(response) + 1, unit) + response)
+
+    async def _serve_client(self, reader, writer):
+        self.stats["connections"] += 1
+        tasks = set()
+        try:
+            while True:
+                header = await reader.readexactly(7)
+                tid, _, length, unit = struct.unpack(">HHHB", header)
+                pdu = await reader.readexactly(length - 1)
+                if unit not in self.plc.units:
+                    continue
+                if self.faults.concurrent:
+                    task = asyncio.ensure_future(self._respond(writer, tid, unit, pdu))
+                    tasks.add(task)
+                    task.add_done_callback(tasks.discard)
+                else:
+                    await self._respond(writer, tid, unit, pdu)
+                if writer.is_closing():
+                    break
+                await writer.drain()
+        except (asyncio.IncompleteReadError, ConnectionError):
+            pass
+        finally:
+            for task in tasks:
+                task.cancel()
+            writer.close()
+
+    async def _ticker(self):
+        while True:
+            await asyncio.sleep(self.tick_interval)
+            self.plc.tick()
+
+    async def serve_forever(self):
+        server = await asyncio.start_server(self._serve_client, self.host, self.port)
+        logger.info(f"PLC 模擬器啟動 {self.host}:{self.port} (Slave {sorted(self.plc.units)})")
+        ticker = asyncio.ensure_future(self._ticker())
+        try:
+            async with server:
+                await server.serve_forever()
+        finally:
+            ticker.cancel()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="FATEK PLC Modbus TCP 模擬器")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=5020)
+    parser.add_argument("--latency", type=float, default=0.0, help="每筆回應延遲 (ms)")
+    parser.add_argument("--jitter", type=float, default=0.0, help="延遲抖動 ± (ms)")
+    parser.add_argument("--drop-rate", type=float, default=0.0, help="不回應的機率 (0~1)")
+    parser.add_argument("--exception-rate", type=float, default=0.0, help="回傳設備故障例外的機率 (0~1)")
+    parser.add_argument("--disconnect-rate", type=float, default=0.0, help="中斷連線的機率 (0~1)")
+    parser.add_argument("--concurrent", action="store_true", help="同一連線的請求並行處理 (預設依序處理)")
+    parser.add_argument("--seed", type=int, default=None)
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s [%(levelname)s] %(name)s: %(message)s")
+    faults = FaultProfile(
+        latency=args.latency / 1000,
+        jitter=args.jitter / 1000,
+        drop_rate=args.drop_rate,
+        exception_rate=args.exception_rate,
+        disconnect_rate=args.disconnect_rate,
+        concurrent=args.concurrent,
+        seed=args.seed,
+    )
+    server = SimulatorServer(SimulatedPlc(seed=args.seed), faults, args.host, args.port)
+    try:
+        asyncio.run(server.serve_forever())
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,136 @@
+from modbus_manager import check_response, LANE_METER
+from config import (
+    METER1_SLAVE_ID, METER2_SLAVE_ID,
+    PLC_A_SLAVE_ID, PLC_B_SLAVE_ID, PLC_TEMP_SLAVE_ID,
+    METER1_BASE_R, METER2_BASE_R, METER1_PARAMS, METER2_PARAMS,
+    TEMP_R_REG, TEMP_COUNT,
+    BOX_A_COIL_COUNT, BOX_B_COIL_COUNT,
+    READ_PLAN_MAX_GAP,
+    COIL_POLL_INTERVAL, COIL_POLL_DEADLINE, TEMP_POLL_INTERVAL, TEMP_POLL_DEADLINE,
+    METER_POLL_INTERVAL, METER_POLL_DEADLINE,
+    fatek_r_addr, fatek_y_addr,
+)
+
+MAX_READ_REGISTERS = 125
+MAX_READ_COILS = 2000
+
+REGISTER_FUNCTIONS = ("read_holding_registers", "read_input_registers")
+
+PDU_LIMITS = {
+    "read_coils": MAX_READ_COILS,
+    "read_holding_registers": MAX_READ_REGISTERS,
+    "read_input_registers": MAX_READ_REGISTERS,
+}
+
+
+def make_point(key, fn, address, count, device_id, lane=None):
+    return {"key": key, "fn": fn, "address": address, "count": count, "device_id": device_id, "lane": lane}
+
+
+def temperature_points():
+    return [
+        make_point(f"CH{i}", "read_holding_registers", fatek_r_addr(TEMP_R_REG + i), 1, PLC_TEMP_SLAVE_ID)
+        for i in range(TEMP_COUNT)
+    ]
+
+
+def meter_points(base_r, params):
+    return [
+        make_point(
+            p["offset"], "read_holding_registers", fatek_r_addr(base_r + p["offset"]), 2, PLC_A_SLAVE_ID, LANE_METER,
+        )
+        for p in params
+    ]
+
+
+def coil_points(count, device_id):
+    return [make_point(str(i), "read_coils", fatek_y_addr(i), 1, device_id) for i in range(count)]
+
+
+def config_point_groups():
+    return {
+        "temperatures": temperature_points(),
+        "box_b_coils": coil_points(BOX_B_COIL_COUNT, PLC_B_SLAVE_ID),
+        "box_a_coils": coil_points(BOX_A_COIL_COUNT, PLC_A_SLAVE_ID),
+        f"meter_{METER1_SLAVE_ID}": meter_points(METER1_BASE_R, METER1_PARAMS),
+        f"meter_{METER2_SLAVE_ID}": meter_points(METER2_BASE_R, METER2_PARAMS),
+    }
+
+
+def config_poll_schedule():
+    coils = {"interval": COIL_POLL_INTERVAL, "deadline": COIL_POLL_DEADLINE}
+    meters = {"interval": METER_POLL_INTERVAL, "deadline": METER_POLL_DEADLINE}
+    return {
+        "temperatures": {"interval": TEMP_POLL_INTERVAL, "deadline": TEMP_POLL_DEADLINE},
+        "box_b_coils": coils,
+        "box_a_coils": coils,
+        f"meter_{METER1_SLAVE_ID}": meters,
+        f"meter_{METER2_SLAVE_ID}": meters,
+    }
+
+
+def plan_reads(points, max_gap=READ_PLAN_MAX_GAP):
+    order = {id(p): i for i, p in enumerate(points)}
+    by_target = {}
+    for p in points:
+        by_target.setdefault((p["fn"], p["device_id"], p.get("lane")), []).append(p)
+
+    blocks = []
+    for (fn, device_id, lane), group in by_target.items():
+        limit = PDU_LIMITS[fn]
+        gap = max_gap if fn in REGISTER_FUNCTIONS else max_gap * 16
+        block = None
+        for p in sorted(group, key=lambda x: (x["address"], x["count"])):
+            end = p["address"] + p["count"]
+            if block is not None:
+                block_end = block["address"] + block["count"]
+                if p["address"] - block_end <= gap and max(end, block_end) - block["address"] <= limit:
+                    block["count"] = max(end, block_end) - block["address"]
+                    block["points"].append(p)
+                    continue
+            block = {
+                "fn": fn, "device_id": device_id, "lane": lane,
+                "address": p["address"], "count": p["count"], "points": [p],
+            }
+            blocks.append(block)
+    blocks.sort(key=lambda b: min(order[id(p)] for p in b["points"]))
+    return blocks
+
+
+def block_request(block):
+    request = (block["fn"], block["address"], block["count"], block["device_id"])
+    if block.get("lane") is not None:
+        request += (block["lane"],)
+    return request
+
+
+def route_values(blocks, responses):
+    values = {}
+    errors = {}
+    for block, response in zip(blocks, responses):
+        try:
+            check_response(response)
+        except Exception as e:
+            for p in block["points"]:
+                errors[p["id"]] = e
+            continue
+        data = response.registers if block["fn"] in REGISTER_FUNCTIONS else response.bits
+        for p in block["points"]:
+            start = p["address"] - block["address"]
+            values[p["id"]] = data[start:start + p["count"]]
+    return values, errors
+
+
+def describe_plan(blocks):
+    return {
+        "requests": len(blocks),
+        "registers": sum(b["count"] for b in blocks if b["fn"] in REGISTER_FUNCTIONS),
+        "coils": sum(b["count"] for b in blocks if b["fn"] not in REGISTER_FUNCTIONS),
+        "blocks": [
+            {
+                "fn": b["fn"], "device_id": b["device_id"], "lane": b.get("lane"),
+                "address": b["address"], "count": b["count"], "points": len(b["points"]),
+            }
+            for b in blocks
+        ],
+    }
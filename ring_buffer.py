@@ -0,0 +1,35 @@
+import numpy as np
+
+
+class RingBuffer:
+    def __init__(self, capacity, dtype):
+        self.capacity = capacity
+        self.dtype = np.dtype(dtype)
+        self._buf = np.zeros(capacity * 2, dtype=self.dtype)
+        self._head = 0
+
+    def __len__(self):
+        return min(self._head, self.capacity)
+
+    def append(self, record):
+        idx = self._head % self.capacity
+        self._buf[idx] = record
+        self._buf[idx + self.capacity] = record
+        self._head += 1
+
+    def extend(self, records):
+        records = np.asarray(records, dtype=self.dtype)[-self.capacity:]
+        if len(records) == 0:
+            return
+        idx = (self._head + np.arange(len(records))) % self.capacity
+        self._buf[idx] = records
+        self._buf[idx + self.capacity] = records
+        self._head += len(records)
+
+    def last(self, n=None):
+        size = len(self)
+        n = size if n is None else max(min(n, size), 0)
+        if n == 0:
+            return self._buf[:0]
+        end = (self._head - 1) % self.capacity + self.capacity + 1
+        return self._buf[end - n:end]
@@ -0,0 +1,217 @@
+import math
+import logging
+import numpy as np
+from ring_buffer import RingBuffer
+from ts_store import SegmentStore
+
+logger = logging.getLogger(__name__)
+
+
+def parse_tiers(spec):
+    tiers = []
+    for part in spec.split(","):
+        if part.strip():
+            seconds, capacity = part.split(":")
+            tiers.append((int(seconds), int(capacity)))
+    return sorted(tiers)
+
+
+def tier_label(seconds):
+    if seconds % 3600 == 0:
+        return f"{seconds // 3600}h"
+    if seconds % 60 == 0:
+        return f"{seconds // 60}m"
+    return f"{seconds}s"
+
+
+class RollupTier:
+    def __init__(self, seconds, capacity, columns, directory=None, name=None):
+        self.seconds = seconds
+        self.capacity = capacity
+        self.label = tier_label(seconds)
+        self.dtype = np.dtype([
+            ("ts", "<f8"),
+            ("min", "<f4", (columns,)),
+            ("max", "<f4", (columns,)),
+            ("sum", "<f8", (columns,)),
+            ("count", "<u4", (columns,)),
+        ])
+        self.buckets = RingBuffer(capacity, self.dtype)
+        self._current = None
+        self.replay_from = -math.inf
+        self.store = None
+        if directory is not None:
+            self.store = SegmentStore(
+                directory, f"{name}-{self.label}", self.dtype, segment_records=capacity, max_segments=1,
+            )
+
+    def _seal(self, records):
+        self.buckets.extend(records)
+        if self.store is not None:
+            try:
+                self.store.append(records)
+            except Exception as e:
+                logger.warning(f"寫入彙總資料失敗 ({self.label}): {e}")
+
+    def restore(self, now):
+        if self.store is not None:
+            self.buckets.extend(self.store.tail(self.capacity))
+        if len(self.buckets):
+            self.replay_from = float(self.buckets.last(1)["ts"][0]) + self.seconds
+        else:
+            self.replay_from = now - now % self.seconds - self.seconds * self.capacity
+        return self.replay_from
+
+    def _new_bucket(self, start):
+        bucket = np.zeros((), dtype=self.dtype)
+        bucket["ts"] = start
+        bucket["min"] = np.inf
+        bucket["max"] = -np.inf
+        return bucket
+
+    def _merge(self, bucket, mins, maxs, sums, counts):
+        bucket["min"] = np.fmin(bucket["min"], mins)
+        bucket["max"] = np.fmax(bucket["max"], maxs)
+        bucket["sum"] += sums
+        bucket["count"] += counts
+
+    def add(self, ts, values):
+        start = ts - ts % self.seconds
+        if self._current is None:
+            self._current = self._new_bucket(start)
+        elif start > self._current["ts"]:
+            self._seal(self._current[np.newaxis])
+            self._current = self._new_bucket(start)
+        valid = ~np.isnan(values)
+        self._merge(
+            self._current,
+            np.where(valid, values, np.inf),
+            np.where(valid, values, -np.inf),
+            np.where(valid, values, 0.0),
+            valid.astype(np.uint32),
+        )
+
+    def load(self, ts, values):
+        if len(ts) == 0:
+            return
+        starts = ts - ts % self.seconds
+        edges = np.concatenate([[0], np.flatnonzero(np.diff(starts)) + 1])
+        valid = ~np.isnan(values)
+        records = np.zeros(len(edges), dtype=self.dtype)
+        records["ts"] = starts[edges]
+        records["min"] = np.minimum.reduceat(np.where(valid, values, np.inf), edges, axis=0)
+        records["max"] = np.maximum.reduceat(np.where(valid, values, -np.inf), edges, axis=0)
+        records["sum"] = np.add.reduceat(np.where(valid, values, 0.0), edges, axis=0)
+        records["count"] = np.add.reduceat(valid.astype(np.uint32), edges, axis=0)
+
+        if self._current is not None and records["ts"][0] == self._current["ts"]:
+            first = records[0]
+            self._merge(self._current, first["min"], first["max"], first["sum"], first["count"])
+            records = records[1:]
+        if len(records):
+            if self._current is not None:
+                self._seal(self._current[np.newaxis])
+            self._seal(records[:-1])
+            self._current = np.array(records[-1])
+
+    def first_ts(self):
+        if len(self.buckets):
+            return float(self.buckets.last(len(self.buckets))["ts"][0])
+        if self._current is not None:
+            return float(self._current["ts"])
+        return None
+
+    def query(self, t_from=None, t_to=None, column=0):
+        records = self.buckets.last()
+        if self._current is not None:
+            records = np.concatenate([records, self._current[np.newaxis]])
+        ts = records["ts"]
+        mask = np.ones(len(records), dtype=bool)
+        if t_from is not None:
+            mask &= ts + self.seconds > t_from
+        if t_to is not None:
+            mask &= ts <= t_to
+        records = records[mask]
+        counts = records["count"][:, column]
+        has_data = counts > 0
+        records = records[has_data]
+        counts = counts[has_data]
+        return {
+            "ts": records["ts"],
+            "avg": records["sum"][:, column] / counts,
+            "min": records["min"][:, column],
+            "max": records["max"][:, column],
+            "count": counts,
+        }
+
+    def bucket_count(self, t_from, t_to):
+        return math.ceil((t_to - t_from) / self.seconds) + 1
+
+
+class Rollup:
+    def __init__(self, columns, tiers, directory=None, name=None):
+        self.columns = columns
+        self.tiers = [RollupTier(seconds, capacity, columns, directory, name) for seconds, capacity in tiers]
+
+    def add(self, ts, values):
+        values = np.asarray(values, dtype=np.float64).reshape(self.columns)
+        for tier in self.tiers:
+            tier.add(ts, values)
+
+    def load(self, ts, values):
+        values = np.asarray(values, dtype=np.float64).reshape(len(ts), self.columns)
+        for tier in self.tiers:
+            keep = ts >= tier.replay_from
+            tier.load(ts[keep], values[keep])
+
+    def restore(self, now):
+        return min((tier.restore(now) for tier in self.tiers), default=now)
+
+    def first_ts(self):
+        return min((t for t in (tier.first_ts() for tier in self.tiers) if t is not None), default=None)
+
+    def flush(self):
+        for tier in self.tiers:
+            if tier.store is not None:
+                tier.store.flush()
+
+    def close(self):
+        for tier in self.tiers:
+            if tier.store is not None:
+                tier.store.close()
+
+    def pick(self, t_from, t_to, max_points):
+        for tier in self.tiers:
+            first = tier.first_ts()
+            if first is None or first > t_from:
+                continue
+            if tier.bucket_count(t_from, t_to) <= max_points:
+                return tier
+        return None
+
+
+def lttb(x, y, n):
+    size = len(x)
+    if n >= size or n < 3:
+        return np.arange(size)
+    x = np.asarray(x, dtype=np.float64)
+    y = np.asarray(y, dtype=np.float64)
+    every = (size - 2) / (n - 2)
+    selected = np.zeros(n, dtype=np.intp)
+    a = 0
+    for i in range(n - 2):
+        avg_start = int(math.floor((i + 1) * every)) + 1
+        avg_end = min(int(math.floor((i + 2) * every)) + 1, size)
+        avg_x = x[avg_start:avg_end].mean()
+        avg_y = y[avg_start:avg_end].mean()
+
+        range_start = int(math.floor(i * every)) + 1
+        range_end = int(math.floor((i + 1) * every)) + 1
+        area = np.abs(
+            (x[a] - avg_x) * (y[range_start:range_end] - y[a])
+            - (x[a] - x[range_start:range_end]) * (avg_y - y[a])
+        )
+        a = range_start + int(np.argmax(area))
+        selected[i + 1] = a
+    selected[-1] = size - 1
+    return selected
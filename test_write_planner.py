@@ -0,0 +1,110 @@
+import pytest
+from write_planner import parse_fan_target, plan_fan_writes, apply_fan_targets, coil_blocks, BOX_SLAVES
+
+
+class FakeResponse:
+    def isError(self):
+        return False
+
+
+class FakeManager:
+    def __init__(self, fail=None):
+        self.fail = fail or {}
+        self.writes = []
+
+    def write_coils(self, address, values, device_id):
+        self.writes.append((device_id, address, list(values)))
+        error = self.fail.get(address)
+        if error is not None:
+            raise error
+        return FakeResponse()
+
+
+def fan(box, y_l, y_h, speed):
+    return parse_fan_target({"box": box, "y_l": y_l, "y_h": y_h, "speed": speed})
+
+
+def test_high_speed_raises_l_before_h():
+    manager = FakeManager()
+    results, transactions = apply_fan_targets(manager, [fan("a", 4, 5, "high")])
+
+    assert results[0]["success"]
+    assert manager.writes == [
+        (BOX_SLAVES["a"], 4, [True, False]),
+        (BOX_SLAVES["a"], 5, [True]),
+    ]
+    assert [t["phase"] for t in transactions] == [1, 2]
+
+
+def test_low_and_off_need_no_second_phase():
+    manager = FakeManager()
+    apply_fan_targets(manager, [fan("b", 0, 1, "low"), fan("b", 2, 3, "off")])
+
+    assert manager.writes == [(BOX_SLAVES["b"], 0, [True, False, False, False])]
+
+
+def test_phase_two_gap_fill_rewrites_neighbours_with_final_values():
+    manager = FakeManager()
+    targets = [fan("a", 0, 1, "high"), fan("a", 2, 3, "low"), fan("a", 4, 5, "high")]
+    apply_fan_targets(manager, targets)
+
+    assert manager.writes[0] == (BOX_SLAVES["a"], 0, [True, False, True, False, True, False])
+    assert manager.writes[1] == (BOX_SLAVES["a"], 1, [True, True, False, True, True])
+
+
+def test_failed_phase_one_fan_is_left_out_of_phase_two():
+    manager = FakeManager(fail={10: ConnectionError("timeout")})
+    targets = [fan("a", 0, 1, "high"), fan("a", 10, 11, "high")]
+    results, transactions = apply_fan_targets(manager, targets)
+
+    assert results[0]["success"]
+    assert not results[1]["success"]
+    assert results[1]["retryable"]
+    assert manager.writes[2:] == [(BOX_SLAVES["a"], 1, [True])]
+    assert all(not (t["address"] <= 11 < t["address"] + t["count"]) for t in transactions if t["phase"] == 2)
+
+
+def test_phase_two_failure_marks_every_fan_raised_by_the_block():
+    manager = FakeManager(fail={1: ConnectionError("timeout")})
+    targets = [fan("a", 0, 1, "high"), fan("a", 2, 3, "high"), fan("a", 4, 5, "low")]
+    results, transactions = apply_fan_targets(manager, targets)
+
+    assert manager.writes[1] == (BOX_SLAVES["a"], 1, [True, True, True])
+    assert [r["success"] for r in results] == [False, False, True]
+    assert [t["phase"] for t in transactions] == [1]
+
+
+def test_non_connection_error_is_not_retryable():
+    manager = FakeManager(fail={0: ValueError("bad")})
+    (result,), _ = apply_fan_targets(manager, [fan("b", 0, 1, "low")])
+
+    assert not result["success"]
+    assert not result["retryable"]
+
+
+def test_single_speed_fan_writes_one_coil():
+    manager = FakeManager()
+    target = parse_fan_target({"box": "b", "y_l": 7, "speed": "on"})
+    apply_fan_targets(manager, [target])
+
+    assert manager.writes == [(BOX_SLAVES["b"], 7, [True])]
+
+
+def test_overlapping_targets_are_rejected():
+    with pytest.raises(ValueError):
+        plan_fan_writes([fan("a", 0, 1, "low"), fan("a", 1, 2, "high")])
+
+
+@pytest.mark.parametrize("item", [
+    {"box": "b", "y_l": 28, "y_h": 29, "speed": "high"},
+    {"box": "b", "y_l": -1, "y_h": 0, "speed": "low"},
+    {"box": "a", "y_l": 64, "speed": "on"},
+])
+def test_out_of_range_y_is_rejected_before_writing(item):
+    with pytest.raises(ValueError):
+        parse_fan_target(item)
+
+
+def test_coil_blocks_split_at_limit():
+    values = {a: True for a in range(5)}
+    assert coil_blocks(values, limit=2) == [(0, [True, True]), (2, [True, True]), (4, [True])]
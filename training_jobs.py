@@ -0,0 +1,199 @@
+import os
+import sys
+import json
+import time
+import uuid
+import fcntl
+import threading
+import subprocess
+import logging
+import numpy as np
+from collections import OrderedDict
+from ml_engine import collector, detector, DATA_DIR, MODEL_FILE
+from autoencoder import weights_path_for
+
+logger = logging.getLogger(__name__)
+
+WORKER_SCRIPT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "autoencoder.py")
+LOCK_FILE = os.path.join(DATA_DIR, "train.lock")
+MAX_JOBS = 20
+
+
+class TrainingBusyError(Exception):
+    pass
+
+
+class TrainingJob:
+    def __init__(self, channel, epochs):
+        self.id = uuid.uuid4().hex[:12]
+        self.channel = channel
+        self.epochs = epochs
+        self.status = "running"
+        self.epoch = 0
+        self.losses = []
+        self.result = None
+        self.error = None
+        self.created = time.time()
+        self.finished = None
+        self.cancel_requested = False
+        self.process = None
+        self.data_path = os.path.join(DATA_DIR, f"train-{self.id}.npy")
+        self.model_path = os.path.join(DATA_DIR, f"train-{self.id}.pt")
+        self.weights_path = weights_path_for(self.model_path)
+
+    def to_dict(self, include_losses=True):
+        data = {
+            "id": self.id,
+            "channel": self.channel,
+            "epochs": self.epochs,
+            "status": self.status,
+            "epoch": self.epoch,
+            "progress": round(self.epoch / self.epochs, 3) if self.epochs else 1.0,
+            "loss": round(self.losses[-1], 6) if self.losses else None,
+            "result": self.result,
+            "error": self.error,
+            "created": self.created,
+            "finished": self.finished,
+        }
+        if include_losses:
+            data["losses"] = [round(v, 6) for v in self.losses]
+        return data
+
+
+class TrainingJobs:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._jobs = OrderedDict()
+        self._active = None
+        self._lock_fd = None
+
+    def _acquire_file_lock(self):
+        fd = os.open(LOCK_FILE, os.O_RDWR | os.O_CREAT, 0o644)
+        try:
+            fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            os.close(fd)
+            return False
+        self._lock_fd = fd
+        return True
+
+    def _release_file_lock(self):
+        if self._lock_fd is not None:
+            fcntl.flock(self._lock_fd, fcntl.LOCK_UN)
+            os.close(self._lock_fd)
+            self._lock_fd = None
+
+    def submit(self, channel="CH0", epochs=50):
+        if not detector.torch_available():
+            raise ValueError("PyTorch 不可用")
+        if epochs < 1:
+            raise ValueError("epochs 必須大於 0")
+
+        _, series = collector.get_temperature_series(channel, limit=1000)
+        if len(series) < 20:
+            raise ValueError(f"資料不足 (需要 20 筆以上，目前 {len(series)} 筆)")
+
+        with self._lock:
+            if self._active is not None:
+                raise TrainingBusyError(f"訓練進行中: {self._active.id}")
+            if not self._acquire_file_lock():
+                raise TrainingBusyError("其他程序正在訓練")
+
+            job = TrainingJob(channel, epochs)
+            try:
+                np.save(job.data_path, np.asarray(series, dtype=np.float32))
+                args = [sys.executable, WORKER_SCRIPT, job.data_path, str(epochs), job.model_path]
+                if os.path.exists(MODEL_FILE):
+                    args.append(MODEL_FILE)
+                job.process = subprocess.Popen(
+                    args, stdout=subprocess.PIPE, stderr=subprocess.STDOUT, text=True,
+                )
+            except Exception:
+                self._cleanup(job)
+                self._release_file_lock()
+                raise
+
+            self._active = job
+            self._jobs[job.id] = job
+            while len(self._jobs) > MAX_JOBS:
+                self._jobs.popitem(last=False)
+
+        threading.Thread(target=self._monitor, args=(job,), daemon=True).start()
+        logger.info(f"訓練工作 {job.id} 開始: {channel}, {epochs} epochs")
+        return job
+
+    def _monitor(self, job):
+        last_output = ""
+        for line in job.process.stdout:
+            try:
+                message = json.loads(line)
+            except ValueError:
+                if line.strip():
+                    last_output = line.strip()
+                continue
+            if "epoch" in message:
+                job.epoch = message["epoch"]
+                job.losses.append(message["loss"])
+            elif message.get("done"):
+                job.result = {k: v for k, v in message.items() if k != "done"}
+            elif "error" in message:
+                job.error = message["error"]
+        returncode = job.process.wait()
+
+        if job.cancel_requested:
+            job.status = "cancelled"
+        elif returncode == 0 and job.result is not None:
+            try:
+                detector.install_model(job.model_path, job.weights_path)
+                job.status = "succeeded"
+            except Exception as e:
+                job.status = "failed"
+                job.error = f"套用模型失敗: {e}"
+        else:
+            job.status = "failed"
+            if not job.error:
+                job.error = last_output or f"訓練程序結束 (code={returncode})"
+
+        job.finished = time.time()
+        self._cleanup(job)
+        with self._lock:
+            if self._active is job:
+                self._active = None
+            self._release_file_lock()
+        if job.status == "failed":
+            logger.error(f"訓練工作 {job.id} 失敗: {job.error}")
+        else:
+            logger.info(f"訓練工作 {job.id} {job.status}")
+
+    def _cleanup(self, job):
+        for path in (job.data_path, job.model_path, job.weights_path):
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+
+    def get(self, job_id):
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def list(self):
+        with self._lock:
+            return list(self._jobs.values())
+
+    def cancel(self, job_id):
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is None or job.status != "running":
+                return job
+            job.cancel_requested = True
+            job.process.terminate()
+        return job
+
+    def close(self):
+        with self._lock:
+            job = self._active
+        if job is not None:
+            self.cancel(job.id)
+
+
+trainer = TrainingJobs()
@@ -0,0 +1,258 @@
+import os
+import re
+import time
+import threading
+import logging
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+INDEX_DTYPE = np.dtype([
+    ("seq", "<u4"),
+    ("count", "<u4"),
+    ("first_ts", "<f8"),
+    ("last_ts", "<f8"),
+])
+
+
+class SegmentStore:
+    def __init__(self, directory, name, dtype, segment_records=43200, max_segments=90, fsync_interval=2.0):
+        self.directory = directory
+        self.name = name
+        self.dtype = np.dtype(dtype)
+        if "ts" not in self.dtype.names:
+            raise ValueError("記錄格式必須包含 ts 欄位")
+        self.segment_records = segment_records
+        self.max_segments = max_segments
+        self.fsync_interval = fsync_interval
+        self._lock = threading.Lock()
+        self._fd = None
+        self._last_fsync = time.time()
+        self._dirty = False
+        os.makedirs(directory, exist_ok=True)
+        self._index = self._load_index()
+        self._active_seq = int(self._index["seq"][-1]) + 1 if len(self._index) else 0
+        if self._index_incomplete():
+            self._rebuild_index()
+        self._active_count = self._recover_active()
+        self._discard_orphans()
+
+    def _segment_path(self, seq):
+        return os.path.join(self.directory, f"{self.name}-{seq:06d}.seg")
+
+    def _index_path(self):
+        return os.path.join(self.directory, f"{self.name}.idx")
+
+    def _load_index(self):
+        path = self._index_path()
+        if not os.path.exists(path):
+            return np.zeros(0, dtype=INDEX_DTYPE)
+        size = os.path.getsize(path)
+        count = size // INDEX_DTYPE.itemsize
+        return np.fromfile(path, dtype=INDEX_DTYPE, count=count)
+
+    def _segment_files(self):
+        pattern = re.compile(rf"^{re.escape(self.name)}-(\d+)\.seg$")
+        files = {}
+        for filename in os.listdir(self.directory):
+            match = pattern.match(filename)
+            if match:
+                files[int(match.group(1))] = os.path.join(self.directory, filename)
+        return files
+
+    def _index_incomplete(self):
+        path = self._index_path()
+        if os.path.exists(path) and os.path.getsize(path) % INDEX_DTYPE.itemsize:
+            return True
+        active = self._segment_path(self._active_seq)
+        if os.path.exists(active) and os.path.getsize(active) >= self.segment_records * self.dtype.itemsize:
+            return True
+        oldest = int(self._index["seq"][0]) if len(self._index) else 0
+        known = set(int(s) for s in self._index["seq"])
+        known.add(self._active_seq)
+        return any(seq >= oldest and seq not in known for seq in self._segment_files())
+
+    def _validate_segment(self, seq, path):
+        count = os.path.getsize(path) // self.dtype.itemsize
+        if count == 0:
+            return None
+        segment = np.memmap(path, dtype=self.dtype, mode="r", shape=(count,))
+        ts = np.array(segment["ts"])
+        del segment
+        if not np.all(np.isfinite(ts)) or np.any(np.diff(ts) < 0):
+            return None
+        return (seq, count, ts[0], ts[-1])
+
+    def _rebuild_index(self):
+        entries = []
+        for seq, path in sorted(self._segment_files().items()):
+            entry = self._validate_segment(seq, path)
+            if entry is None:
+                os.remove(path)
+                logger.warning(f"{self.name}: 移除無效的區段 {os.path.basename(path)}")
+            else:
+                entries.append(entry)
+        active = entries[-1][0] if entries and entries[-1][1] < self.segment_records else None
+        sealed = [e for e in entries if e[0] != active]
+        for seq, count, _, _ in sealed:
+            if count * self.dtype.itemsize != os.path.getsize(self._segment_path(seq)):
+                with open(self._segment_path(seq), "r+b") as f:
+                    f.truncate(count * self.dtype.itemsize)
+        self._index = np.array(sealed, dtype=INDEX_DTYPE)
+        if len(self._index) > self.max_segments:
+            for seq in self._index["seq"][:-self.max_segments]:
+                os.remove(self._segment_path(int(seq)))
+            self._index = self._index[-self.max_segments:]
+        self._write_index()
+        if active is not None:
+            self._active_seq = active
+        else:
+            self._active_seq = int(self._index["seq"][-1]) + 1 if len(self._index) else 0
+        logger.warning(f"{self.name}: 由區段檔重建索引 ({len(self._index)} 個封存區段)")
+
+    def _write_index(self):
+        path = self._index_path()
+        tmp = path + ".tmp"
+        with open(tmp, "wb") as f:
+            f.write(self._index.tobytes())
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, path)
+
+    def _recover_active(self):
+        path = self._segment_path(self._active_seq)
+        if not os.path.exists(path):
+            return 0
+        count, partial = divmod(os.path.getsize(path), self.dtype.itemsize)
+        if partial:
+            with open(path, "r+b") as f:
+                f.truncate(count * self.dtype.itemsize)
+            logger.warning(f"{self.name}: 截斷不完整記錄 ({partial} bytes)")
+        return count
+
+    def _discard_orphans(self):
+        known = set(int(s) for s in self._index["seq"])
+        known.add(self._active_seq)
+        for seq, path in self._segment_files().items():
+            if seq not in known:
+                os.remove(path)
+                logger.warning(f"{self.name}: 移除已過期的區段 {os.path.basename(path)}")
+
+    def append(self, records):
+        records = np.atleast_1d(np.asarray(records, dtype=self.dtype))
+        with self._lock:
+            pos = 0
+            while pos < len(records):
+                chunk = records[pos:pos + self.segment_records - self._active_count]
+                if self._fd is None:
+                    self._fd = os.open(
+                        self._segment_path(self._active_seq),
+                        os.O_WRONLY | os.O_CREAT | os.O_APPEND,
+                        0o644,
+                    )
+                os.write(self._fd, chunk.tobytes())
+                self._dirty = True
+                self._active_count += len(chunk)
+                pos += len(chunk)
+                if self._active_count >= self.segment_records:
+                    self._rotate()
+            if self._dirty and time.time() - self._last_fsync >= self.fsync_interval:
+                self._fsync()
+
+    def _fsync(self):
+        if self._fd is not None:
+            os.fsync(self._fd)
+        self._dirty = False
+        self._last_fsync = time.time()
+
+    def _rotate(self):
+        self._fsync()
+        os.close(self._fd)
+        self._fd = None
+        segment = np.memmap(self._segment_path(self._active_seq), dtype=self.dtype, mode="r", shape=(self._active_count,))
+        entry = np.array(
+            [(self._active_seq, self._active_count, segment["ts"][0], segment["ts"][-1])],
+            dtype=INDEX_DTYPE,
+        )
+        del segment
+        self._index = np.concatenate([self._index, entry])
+        expired = self._index[:-self.max_segments] if len(self._index) > self.max_segments else self._index[:0]
+        self._index = self._index[len(expired):]
+        self._write_index()
+        for seq in expired["seq"]:
+            try:
+                os.remove(self._segment_path(int(seq)))
+            except FileNotFoundError:
+                pass
+        self._active_seq += 1
+        self._active_count = 0
+
+    def flush(self):
+        with self._lock:
+            if self._dirty:
+                self._fsync()
+
+    def close(self):
+        with self._lock:
+            if self._fd is not None:
+                self._fsync()
+                os.close(self._fd)
+                self._fd = None
+
+    def _segments(self):
+        with self._lock:
+            segments = [(int(r["seq"]), int(r["count"]), float(r["first_ts"]), float(r["last_ts"])) for r in self._index]
+            if self._active_count:
+                segments.append((self._active_seq, self._active_count, None, None))
+        return segments
+
+    def _map(self, seq, count):
+        try:
+            return np.memmap(self._segment_path(seq), dtype=self.dtype, mode="r", shape=(count,))
+        except (FileNotFoundError, ValueError):
+            return np.zeros(0, dtype=self.dtype)
+
+    def iter_chunks(self, t_from=None, t_to=None):
+        for seq, count, first_ts, last_ts in self._segments():
+            if t_from is not None and last_ts is not None and last_ts < t_from:
+                continue
+            if t_to is not None and first_ts is not None and first_ts > t_to:
+                continue
+            segment = self._map(seq, count)
+            ts = segment["ts"]
+            lo = int(np.searchsorted(ts, t_from, side="left")) if t_from is not None else 0
+            hi = int(np.searchsorted(ts, t_to, side="right")) if t_to is not None else len(segment)
+            if hi > lo:
+                yield segment[lo:hi]
+
+    def first_ts(self):
+        for seq, count, first_ts, _ in self._segments():
+            if first_ts is not None:
+                return first_ts
+            segment = self._map(seq, count)
+            if len(segment):
+                return float(segment["ts"][0])
+        return None
+
+    def tail(self, n):
+        parts = []
+        remaining = n
+        for seq, count, _, _ in reversed(self._segments()):
+            if remaining <= 0:
+                break
+            segment = self._map(seq, count)
+            parts.append(segment[max(len(segment) - remaining, 0):])
+            remaining -= len(parts[-1])
+        if not parts:
+            return np.zeros(0, dtype=self.dtype)
+        return np.concatenate(parts[::-1])
+
+    def get_stats(self):
+        segments = self._segments()
+        records = sum(s[1] for s in segments)
+        return {
+            "segments": len(segments),
+            "records": records,
+            "bytes": records * self.dtype.itemsize,
+            "first_ts": segments[0][2] if segments else None,
+        }
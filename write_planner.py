@@ -0,0 +1,128 @@
+from modbus_manager import check_response
+from config import PLC_A_SLAVE_ID, PLC_B_SLAVE_ID, BOX_A_COIL_COUNT, BOX_B_COIL_COUNT, FATEK_Y_OFFSET
+
+MAX_WRITE_COILS = 1968
+
+BOX_SLAVES = {"a": PLC_A_SLAVE_ID, "b": PLC_B_SLAVE_ID}
+BOX_COIL_COUNTS = {"a": BOX_A_COIL_COUNT, "b": BOX_B_COIL_COUNT}
+DUAL_SPEEDS = ("off", "low", "high")
+SINGLE_SPEEDS = ("off", "on")
+
+
+def coil_blocks(values, required=None, limit=MAX_WRITE_COILS):
+    required = set(values) if required is None else set(required)
+    runs = []
+    for address in sorted(values):
+        if runs and address == runs[-1][-1] + 1:
+            runs[-1].append(address)
+        else:
+            runs.append([address])
+
+    blocks = []
+    for run in runs:
+        needed = [a for a in run if a in required]
+        if not needed:
+            continue
+        start = needed[0]
+        end = needed[-1] + 1
+        while start < end:
+            count = min(end - start, limit)
+            blocks.append((start, [values[a] for a in range(start, start + count)]))
+            start += count
+    return blocks
+
+
+def check_y_address(box, address):
+    if not FATEK_Y_OFFSET <= address < FATEK_Y_OFFSET + BOX_COIL_COUNTS[box]:
+        raise ValueError(f"{box.upper()}箱 Y 位址超出範圍: {address} (共 {BOX_COIL_COUNTS[box]} 點)")
+    return address
+
+
+def parse_fan_target(item):
+    box = str(item.get("box", "")).lower()
+    if box not in BOX_SLAVES:
+        raise ValueError("無效的箱號")
+    y_l = item.get("y_l")
+    y_h = item.get("y_h")
+    speed = item.get("speed")
+    if y_l is None:
+        raise ValueError("需要 y_l")
+    if y_h is None:
+        if speed not in SINGLE_SPEEDS:
+            raise ValueError("單速送風機 speed 需為 off/on")
+        return {"box": box, "y_l": check_y_address(box, int(y_l)), "y_h": None, "speed": speed}
+    if speed not in DUAL_SPEEDS:
+        raise ValueError("雙速送風機 speed 需為 off/low/high")
+    return {
+        "box": box,
+        "y_l": check_y_address(box, int(y_l)),
+        "y_h": check_y_address(box, int(y_h)),
+        "speed": speed,
+    }
+
+
+def target_coils(target):
+    if target["y_h"] is None:
+        on = target["speed"] == "on"
+        return {target["y_l"]: on}, {target["y_l"]: on}
+    l_val = target["speed"] != "off"
+    h_val = target["speed"] == "high"
+    return {target["y_l"]: l_val, target["y_h"]: False}, {target["y_l"]: l_val, target["y_h"]: h_val}
+
+
+def plan_fan_writes(targets):
+    boxes = {}
+    for index, target in enumerate(targets):
+        box = boxes.setdefault(target["box"], {"first": {}, "final": {}, "owners": {}, "targets": []})
+        first, final = target_coils(target)
+        for address in first:
+            if address in box["owners"]:
+                other = targets[box["owners"][address]]
+                raise ValueError(f"{target['box'].upper()}箱 Y{address} 重複出現於多個目標 (與 y_l={other['y_l']})")
+            box["owners"][address] = index
+        box["first"].update(first)
+        box["final"].update(final)
+        box["targets"].append(index)
+    return boxes
+
+
+def _write_blocks(manager, device_id, blocks, owners, required, errors):
+    for address, values in blocks:
+        indexes = {owners[a] for a in range(address, address + len(values)) if a in required}
+        try:
+            check_response(manager.write_coils(address, values, device_id))
+        except ConnectionError as e:
+            for i in indexes:
+                errors.setdefault(i, (str(e), True))
+        except Exception as e:
+            for i in indexes:
+                errors.setdefault(i, (f"寫入錯誤: {e}", False))
+        else:
+            yield address, len(values)
+
+
+def apply_fan_targets(manager, targets):
+    errors = {}
+    transactions = []
+    for box, plan in plan_fan_writes(targets).items():
+        device_id = BOX_SLAVES[box]
+        owners = plan["owners"]
+
+        first = plan["first"]
+        for address, count in _write_blocks(manager, device_id, coil_blocks(first), owners, first, errors):
+            transactions.append({"box": box, "phase": 1, "address": address, "count": count})
+
+        ok = {i for i in plan["targets"] if i not in errors}
+        fillers = {a: v for a, v in plan["final"].items() if owners[a] in ok}
+        raise_h = {targets[i]["y_h"] for i in ok if targets[i]["speed"] == "high"}
+        blocks = coil_blocks(fillers, raise_h)
+        for address, count in _write_blocks(manager, device_id, blocks, owners, raise_h, errors):
+            transactions.append({"box": box, "phase": 2, "address": address, "count": count})
+
+    results = []
+    for index, target in enumerate(targets):
+        result = {**target, "success": index not in errors}
+        if index in errors:
+            result["error"], result["retryable"] = errors[index]
+        results.append(result)
+    return results, transactions